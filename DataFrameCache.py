@@ -1,36 +1,381 @@
-from datetime import datetime, timedelta
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import polars as pl
+
+# Bookkeeping cost of one cache slot (OrderedDict node + entry dict)
+ENTRY_OVERHEAD_BYTES = 300
+
+
+def estimate_size(value):
+    """Approximate in-memory size in bytes of a cached value."""
+    if hasattr(value, "estimated_size"):  # Polars DataFrame / Series
+        return value.estimated_size()
+    if hasattr(value, "memory_usage"):  # pandas DataFrame / Series
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    return sys.getsizeof(value)
+
+
+class ArrowDiskTier:
+    """
+    Polars frames persisted as uncompressed Arrow IPC files in a directory,
+    one file per key, evicted least recently used once their total size
+    exceeds max_bytes. Reads are memory-mapped. Ages come from file mtimes
+    so they survive restarts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.files = OrderedDict()  # file name -> size, oldest use first
+        self.current_bytes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        existing = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".arrow"):
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name, stat.st_size))
+            elif entry.name.endswith(".tmp"):
+                os.remove(entry.path)  # Left by an interrupted write
+        for _, name, size in sorted(existing):
+            self.files[name] = size
+            self.current_bytes += size
+        with self.lock:
+            self.evict()
+        logging.info(f"💽 DataFrameCache disk tier {directory}: {len(self.files)} files, {self.current_bytes} bytes")
+
+    def name_of(self, key) -> str:
+        return hashlib.sha1(repr(key).encode()).hexdigest() + ".arrow"
+
+    def write(self, key, df: pl.DataFrame):
+        name = self.name_of(key)
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        df.write_ipc(tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self.lock:
+            self.current_bytes -= self.files.pop(name, 0)
+            self.files[name] = size
+            self.current_bytes += size
+            self.evict()
+
+    def read(self, key, max_age_seconds: float):
+        """(frame, age in seconds) for key, or None when missing or expired."""
+        name = self.name_of(key)
+        path = os.path.join(self.directory, name)
+        with self.lock:
+            if name not in self.files:
+                return None
+            try:
+                age = time.time() - os.path.getmtime(path)
+            except FileNotFoundError:
+                self.current_bytes -= self.files.pop(name)
+                return None
+            if age >= max_age_seconds:
+                self._remove(name)
+                return None
+            self.files.move_to_end(name)
+
+        try:
+            return pl.read_ipc(path, memory_map=True), age
+        except FileNotFoundError:  # Evicted between the check and the read
+            return None
+
+    def remove(self, key):
+        with self.lock:
+            self._remove(self.name_of(key))
+
+    def _remove(self, name):
+        size = self.files.pop(name, None)
+        if size is None:
+            return
+        self.current_bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        while self.current_bytes > self.max_bytes and self.files:
+            self._remove(next(iter(self.files)))
+            self.evictions += 1
+
+    def purge_expired(self, max_age_seconds: float) -> int:
+        with self.lock:
+            cutoff = time.time() - max_age_seconds
+            expired = []
+            for name in self.files:
+                try:
+                    if os.path.getmtime(os.path.join(self.directory, name)) <= cutoff:
+                        expired.append(name)
+                except FileNotFoundError:
+                    expired.append(name)
+            for name in expired:
+                self._remove(name)
+        return len(expired)
+
+    def clear(self):
+        with self.lock:
+            for name in list(self.files):
+                self._remove(name)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "files": len(self.files),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
 
 class DataFrameCache:
-    def __init__(self, expiration_minutes=60):
-        self.cache = {}  # Dictionary to store DataFrames
+    """
+    Expiring cache of DataFrames (or any values), bounded by entry count and
+    by estimated bytes. Least recently used entries are evicted first once
+    either limit is exceeded; None disables a limit.
+
+    Safe to share between threads. Ages use time.monotonic(), so wall-clock
+    jumps do not expire or keep entries. With sweep_interval_seconds set, a
+    daemon thread purges expired entries that are never read again.
+
+    With disk_dir set, Polars frames are also written through to an
+    ArrowDiskTier there and memory misses are served from it, so a
+    restarted process starts warm.
+    """
+
+    def __init__(
+        self,
+        expiration_minutes=60,
+        max_entries=10_000,
+        max_bytes=256 * 1024 * 1024,
+        sweep_interval_seconds=None,
+        disk_dir=None,
+        disk_max_bytes=1024 * 1024 * 1024,
+    ):
+        self.cache = OrderedDict()  # key -> {"data", "timestamp", "size"}, oldest use first
         self.expiration_minutes = expiration_minutes  # Cache expiry time
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+        # key -> Future of a get_or_compute already running for it
+        self.pending = {}
+        self.disk = ArrowDiskTier(disk_dir, disk_max_bytes) if disk_dir else None
+
+        self.stop_event = threading.Event()
+        self.sweeper = None
+        if sweep_interval_seconds:
+            self.sweeper = threading.Thread(
+                target=self.sweep_periodically,
+                args=(sweep_interval_seconds,),
+                name="dataframe-cache-sweeper",
+                daemon=True,
+            )
+            self.sweeper.start()
+
+    @property
+    def expiration_seconds(self):
+        return self.expiration_minutes * 60
+
+    def is_expired(self, entry, now):
+        return now - entry["timestamp"] >= self.expiration_seconds
 
     def set(self, key, df):
-        """Store DataFrame in cache with timestamp"""
+        """Store DataFrame in cache with timestamp, evicting LRU entries over the limits"""
+        with self.lock:
+            self._put(key, df, time.monotonic())
+
+        if self.disk is not None and isinstance(df, pl.DataFrame):
+            try:
+                self.disk.write(key, df)
+            except OSError:
+                logging.exception("❌ DataFrameCache disk write failed")
+
+    def _put(self, key, df, timestamp):
+        size = ENTRY_OVERHEAD_BYTES + estimate_size(df)
+        self._invalidate(key)
         self.cache[key] = {
             "data": df,
-            "timestamp": datetime.now()
+            "timestamp": timestamp,
+            "size": size,
         }
+        self.current_bytes += size
+        self.evict()
 
     def get(self, key):
         """Retrieve DataFrame from cache if it exists and is not expired"""
-        if key in self.cache:
-            entry = self.cache[key]
-            # Check if expired
-            if (datetime.now() - entry["timestamp"]) < timedelta(minutes=self.expiration_minutes):
+        with self.lock:
+            value = self._get(key)
+        if value is None:
+            value = self.load_from_disk(key)
+        self.record_lookup(value is not None)
+        return value
+
+    def _get(self, key):
+        """Memory tier only; expired entries are dropped."""
+        entry = self.cache.get(key)
+        if entry is not None:
+            if not self.is_expired(entry, time.monotonic()):
+                self.cache.move_to_end(key)
                 return entry["data"]
-            else:
-                self.invalidate(key)  # Remove expired entry
+            self._invalidate(key)  # Remove expired entry
+            self.expirations += 1
         return None  # Return None if not found or expired
 
+    def load_from_disk(self, key):
+        """Frame for key from the disk tier, promoted into memory with its original age."""
+        if self.disk is None:
+            return None
+        loaded = self.disk.read(key, self.expiration_seconds)
+        if loaded is None:
+            return None
+
+        df, age = loaded
+        with self.lock:
+            self._put(key, df, time.monotonic() - age)
+            self.disk_hits += 1
+        return df
+
+    def record_lookup(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_or_compute(self, key, fn):
+        """
+        Cached value for key, computing it with fn() on a miss. Concurrent
+        misses on the same key wait for the first caller's result instead of
+        all running fn; if fn raises, every waiter gets the exception.
+        None results are returned but not cached.
+        """
+        with self.lock:
+            value = self._get(key)
+            if value is None:
+                future = self.pending.get(key)
+                leader = future is None
+                if leader:
+                    future = self.pending[key] = Future()
+        if value is not None:
+            self.record_lookup(True)
+            return value
+
+        if not leader:
+            value = future.result()
+            # Served without running fn, like any other hit
+            self.record_lookup(value is not None)
+            return value
+
+        try:
+            value = self.load_from_disk(key)
+            self.record_lookup(value is not None)
+            if value is None:
+                value = fn()
+                if value is not None:
+                    self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def sweep(self):
+        """Purges every expired entry, in memory and on disk; returns how many were removed"""
+        with self.lock:
+            now = time.monotonic()
+            expired = [key for key, entry in self.cache.items() if self.is_expired(entry, now)]
+            for key in expired:
+                self._invalidate(key)
+            self.expirations += len(expired)
+        removed = len(expired)
+        if self.disk is not None:
+            removed += self.disk.purge_expired(self.expiration_seconds)
+        return removed
+
+    def sweep_periodically(self, interval_seconds):
+        while not self.stop_event.wait(interval_seconds):
+            try:
+                removed = self.sweep()
+                if removed:
+                    logging.info(f"🧹 DataFrameCache swept {removed} expired entries")
+            except Exception:
+                logging.exception("❌ DataFrameCache sweep failed")
+
+    def close(self):
+        """Stops the sweeper thread, if any"""
+        self.stop_event.set()
+        if self.sweeper is not None:
+            self.sweeper.join()
+
+    def evict(self):
+        """Drops least recently used entries until both limits hold; the newest entry is kept"""
+        while len(self.cache) > 1 and (
+            (self.max_entries is not None and len(self.cache) > self.max_entries)
+            or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+        ):
+            _, entry = self.cache.popitem(last=False)
+            self.current_bytes -= entry["size"]
+            self.evictions += 1
+
     def invalidate(self, key):
-        """Remove a specific key from the cache"""
-        if key in self.cache:
-            del self.cache[key]
+        """Remove a specific key from the cache, and from the disk tier"""
+        with self.lock:
+            self._invalidate(key)
+        if self.disk is not None:
+            self.disk.remove(key)
+
+    def _invalidate(self, key):
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry["size"]
 
     def clear(self):
-        """Clear the entire cache"""
-        self.cache.clear()
+        """Clear the entire cache, including the disk tier"""
+        with self.lock:
+            self.cache.clear()
+            self.current_bytes = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "entries": len(self.cache),
+                "bytes": self.current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
 
 # Initialize cache with 60-minute expiry
 cache = DataFrameCache()
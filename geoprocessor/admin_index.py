@@ -0,0 +1,65 @@
+import logging
+import numpy as np
+import shapely
+from shapely import STRtree
+from geoprocessor.postal_index import first_matches
+
+
+class AdminBoundaryIndex:
+    """
+    In-memory STRtree over one geoBoundaries ADM layer.
+
+    The layer is read from DuckDB once; vectorized point lookups then never
+    go back to the database.
+    """
+
+    def __init__(self, geometries: np.ndarray, names: np.ndarray):
+        self.geometries = geometries
+        self.names = names
+
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+
+    @classmethod
+    def from_relation(cls, con, relation: str, name_col: str, geom_col: str = "geom"):
+        """
+        Loads a layer from a DuckDB relation, keeping only name and geometry.
+        relation is anything valid in a FROM clause, e.g. a materialized GADM
+        table or ST_Read('<gpkg>').
+        """
+        logging.info(f"📦 Loading ADM layer {relation} ({name_col})")
+        df = con.execute(
+            f"""
+            SELECT {name_col} AS name, ST_AsWKB({geom_col}) AS wkb
+            FROM {relation}
+            """
+        ).pl()
+        geometries = shapely.from_wkb(df["wkb"].to_numpy())
+        names = df["name"].to_numpy()
+        logging.info(f"🌲 Built ADM STRtree over {len(geometries)} polygons")
+        return cls(geometries, names)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def covers_exclusively(self, bounds: tuple, allow_empty: bool = False) -> bool:
+        """True when every point of the box resolves to the same single polygon."""
+        cell = shapely.box(*bounds)
+        hits = self.tree.query(cell, predicate="intersects")
+        if len(hits) == 0:
+            return allow_empty
+        return len(hits) == 1 and shapely.contains_properly(self.geometries[hits[0]], cell)
+
+    def lookup_many(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Vectorized lookup for arrays of coordinates. Returns an object array of
+        names aligned to the input, None where no polygon contains the point.
+        """
+        points = shapely.points(lons, lats)
+        point_idx, tree_idx = self.tree.query(points, predicate="within")
+        matched = first_matches(point_idx, tree_idx, len(points))
+
+        result = np.full(len(points), None, dtype=object)
+        hit = matched >= 0
+        result[hit] = self.names[matched[hit]]
+        return result
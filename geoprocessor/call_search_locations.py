@@ -1,13 +1,32 @@
 import logging
 import polars as pl
-from shapely.geometry import Point
-from shapely.wkt import loads as wkt_loads
 import duckdb
+from geoprocessor.duckdb_cursors import ThreadCursors
+from geoprocessor.gadm_tables import (
+    drop_gadm_tables,
+    gadm_generation_tables,
+    load_admin_hierarchy,
+    load_gadm_tables,
+)
+from geoprocessor.geocoding_engine import AdminIndexSet, DuckDBGeocodingEngine, build_geocoding_engine
+from geoprocessor.postal_adjacency import load_postal_adjacency
+from geoprocessor.postal_grid import load_postal_grid
+from geoprocessor.reference_watcher import (
+    REFERENCE_POLL_SECONDS,
+    ReferenceDataWatcher,
+    delta_table_version,
+    file_mtime,
+)
+from geoprocessor.usps_dimension import UspsPostalDimension
+from geoprocessor.wof_artifact import open_wof_artifact, wof_artifact_is_current
+from geoprocessor.wof_shards import WofShardStore, artifact_shard_loader, delta_shard_loader
 
 # DuckDB setup
 con = duckdb.connect()
 con.execute("INSTALL spatial; LOAD spatial;")
 con.execute("INSTALL delta; LOAD delta;")
+# Lookups go through a per-thread cursor so callers on several threads never share `con`
+cursors = ThreadCursors(con)
 
 logging.basicConfig(level=logging.INFO)
 
@@ -46,123 +65,207 @@ country_code_mapping = {
 }
 
 class WeatherDataLocationSearcher:
-    def __init__(self, wof_delta_path: str, gadm_paths: dict, pg_conn):
+    def __init__(
+        self,
+        wof_delta_path: str,
+        gadm_paths: dict,
+        pg_conn,
+        device_memo=None,
+        postal_grid_path: str = None,
+        wof_artifact_path: str = None,
+        wof_shard_max_bytes: int = 512 * 1024 * 1024,
+        postal_adjacency_path: str = None,
+        nearest_postal_max_distance_m: float = None,
+        geocoding_backend: str = "grid",
+    ):
         """
         wof_delta_path: path to WOF delta table (Oregon only for now)
         gadm_paths: dict with keys ADM0, ADM1, ADM2 -> gpkg paths
-        pg_conn: Postgres connection object
+        pg_conn: PostgresConnection provider (USPS postal -> city/locale dimension)
+        device_memo: optional DeviceLocationMemo reused for stationary devices
+        postal_grid_path: optional prebuilt PostalGrid (.npz) answering interior points
+        wof_artifact_path: optional prebuilt WOF Arrow IPC artifact, mmapped instead of reading Delta
+        wof_shard_max_bytes: memory budget for WOF shards held per (country, state)
+        postal_adjacency_path: optional prebuilt PostalAdjacency (.parquet) for nearby_postal_codes
+        nearest_postal_max_distance_m: when set, points outside every postal polygon take the
+            nearest one within this many metres
+        geocoding_backend: "grid", "strtree" or "duckdb" (see geocoding_engine)
         """
         self.wof_delta_path = wof_delta_path
         self.gadm_paths = gadm_paths
-        self.pg_conn = pg_conn.get_conn()
-
-        logging.info("📦 Loading WOF Delta table (once, immutable)")
-        self.wof_df = pl.scan_delta(self.wof_delta_path).collect()
-        logging.info(f"📊 WOF rows loaded: {len(self.wof_df)}")
-
-    def lookup_city_from_postgres(self, postal_code: str):
-        if not postal_code:
-            return None, None
-
-        with self.pg_conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT city, locale_name
-                FROM usps_postal_code_mapping
-                WHERE postal_code = %s
-                LIMIT 1
-                """,
-                (postal_code,),
-            )
-            row = cur.fetchone()
-            logging.info(f"🌍 City and locale_name lookup for postal code {postal_code}: {row}")
-
-        city, locale_name = row if row else (None, None)
-        return (city, locale_name)
-
+        self.device_memo = device_memo
+        self.postal_grid_path = postal_grid_path
+        self.wof_artifact_path = wof_artifact_path
+        self.wof_shard_max_bytes = wof_shard_max_bytes
+        self.postal_adjacency_path = postal_adjacency_path
+        self.nearest_postal_max_distance_m = nearest_postal_max_distance_m
+        self.geocoding_backend = geocoding_backend
+        self.reference_watcher = None
+        # GADM tables of the generation replaced by the last reload, dropped on the next one
+        self.retired_gadm_tables = None
+
+        logging.info("📦 Loading USPS postal -> city/locale dimension (refreshed periodically)")
+        self.usps_dimension = UspsPostalDimension(pg_conn)
+
+        self.reference_fingerprint = self.current_reference_fingerprint()
+        # A memo written against other reference data is cleared before it serves anything
+        if self.device_memo is not None:
+            self.device_memo.use_reference(self.reference_fingerprint)
+        self.gadm_generation = 0
+        (
+            self.admin_hierarchy,
+            self.admin_indexes,
+            self.wof_shards,
+            self.postal_grid,
+            self.postal_adjacency,
+            self.geocoding_engine,
+        ) = self.build_reference_data(self.gadm_generation)
 
     # -----------------------------
-    # GADM LOOKUPS (Country/State/County)
+    # REFERENCE DATA (GADM, WOF, grid, adjacency)
     # -----------------------------
-    def _query_gadm(self, level: str, lat: float, lon: float, extract_col: str):
-        path = self.gadm_paths.get(level)
-        if not path:
-            logging.warning(f"GADM path missing for {level}")
-            return None
-
-        query = f"""
-        SELECT {extract_col}
-        FROM ST_Read('{path}')
-        WHERE ST_Contains(geom, ST_Point({lon}, {lat}))
+    def current_reference_fingerprint(self) -> dict:
+        """Versions of every reference data source; any change triggers a reload."""
+        return {
+            "wof": delta_table_version(self.wof_delta_path),
+            "wof_artifact": file_mtime(self.wof_artifact_path),
+            "postal_grid": file_mtime(self.postal_grid_path),
+            "postal_adjacency": file_mtime(self.postal_adjacency_path),
+            "gadm": tuple(file_mtime(self.gadm_paths.get(level)) for level in ("ADM0", "ADM1", "ADM2")),
+        }
+
+    def build_reference_data(self, generation: int, admin=None):
         """
+        Loads every reference data structure and a geocoding engine over them.
+        admin: (admin_hierarchy, admin_indexes) to reuse when GADM is unchanged;
+        otherwise the GADM layers are loaded into the generation's tables.
+        """
+        if admin is None:
+            table_names, hierarchy_table = gadm_generation_tables(generation)
+            logging.info(f"📦 Loading GADM layers into indexed DuckDB tables (generation {generation})")
+            load_gadm_tables(cursors.get(), self.gadm_paths, table_names=table_names)
+            admin = (
+                load_admin_hierarchy(
+                    cursors.get(), country_code_mapping, table_names, hierarchy_table
+                ),
+                AdminIndexSet(cursors, table_names),
+            )
+        admin_hierarchy, admin_indexes = admin
+
+        # WOF shards (frame + postal STRtree) per (country, state), loaded on first use
+        # A stale artifact is refused, so a WOF Delta update reloads from Delta
+        wof_artifact = None
+        if wof_artifact_is_current(self.wof_artifact_path, self.wof_delta_path):
+            wof_artifact = open_wof_artifact(self.wof_artifact_path)
+            loader = artifact_shard_loader(wof_artifact)
+        else:
+            loader = delta_shard_loader(self.wof_delta_path)
+        wof_shards = WofShardStore(loader, max_bytes=self.wof_shard_max_bytes)
+
+        postal_grid = load_postal_grid(self.postal_grid_path, self.wof_delta_path)
+
+        postal_adjacency = load_postal_adjacency(self.postal_adjacency_path, self.wof_delta_path)
+
+        engine = build_geocoding_engine(
+            self.geocoding_backend,
+            cursors,
+            admin_hierarchy,
+            wof_shards,
+            country_code_mapping,
+            self.wof_delta_path,
+            postal_grid=postal_grid,
+            admin_indexes=admin_indexes,
+            nearest_postal_max_distance_m=self.nearest_postal_max_distance_m or 0,
+            wof_artifact=wof_artifact,
+        )
+        return admin_hierarchy, admin_indexes, wof_shards, postal_grid, postal_adjacency, engine
 
-        logging.info(f"🌍 GADM {level} lookup for lat={lat}, lon={lon}")
-        df = con.execute(query).pl()
-
-        if df.is_empty():
-            logging.warning(f"❌ No GADM {level} match")
+    def reload_reference_data(self, fingerprint: dict):
+        """
+        Builds the new reference data next to the current one, warms it
+        with the shards in use, and swaps it in. Lookups already running
+        hold the previous engine and finish on it.
+
+        A postal grid or adjacency table built from an older WOF version than
+        the one loaded is dropped rather than mixed with the new polygons:
+        the engine falls back to strtree until they are rebuilt, and their
+        new mtimes trigger the reload that picks them up.
+        """
+        gadm_changed = fingerprint["gadm"] != self.reference_fingerprint["gadm"]
+        generation = self.gadm_generation + 1 if gadm_changed else self.gadm_generation
+        admin = None if gadm_changed else (self.admin_hierarchy, self.admin_indexes)
+
+        if self.retired_gadm_tables is not None:
+            drop_gadm_tables(cursors.get(), *self.retired_gadm_tables)
+            self.retired_gadm_tables = None
+
+        reference_data = self.build_reference_data(generation, admin)
+        admin_indexes, wof_shards = reference_data[1], reference_data[2]
+        admin_indexes.load_all()
+        for country, state in list(self.wof_shards.shards):
+            wof_shards.get(country, state)
+
+        (
+            self.admin_hierarchy,
+            self.admin_indexes,
+            self.wof_shards,
+            self.postal_grid,
+            self.postal_adjacency,
+            self.geocoding_engine,
+        ) = reference_data
+        if gadm_changed:
+            # Kept until the next reload so lookups still on the old generation can finish
+            self.retired_gadm_tables = gadm_generation_tables(self.gadm_generation)
+            self.gadm_generation = generation
+        self.reference_fingerprint = fingerprint
+
+        # Memoized locations were computed against the old data; clearing also
+        # drops puts from lookups that started before it, on the old engine
+        if self.device_memo is not None:
+            self.device_memo.use_reference(fingerprint)
+
+    def start_reference_watcher(self, poll_seconds: float = REFERENCE_POLL_SECONDS):
+        """Reloads reference data in the background whenever a source changes."""
+        if self.geocoding_backend == DuckDBGeocodingEngine.name:
+            logging.warning("⚠️ The duckdb backend serves fixed DuckDB tables; reference watcher not started")
             return None
 
-        value = df[extract_col][0]
-        logging.info(f"✅ GADM {level} match: {value}")
-        return value
-
-    def find_admin_regions(self, lat: float, lon: float):
-        country = self._query_gadm("ADM0", lat, lon, "shapeGroup")
-        if country:
-            country = country_code_mapping.get(country, country)
+        self.reference_watcher = ReferenceDataWatcher(
+            self.current_reference_fingerprint,
+            self.reload_reference_data,
+            poll_seconds,
+            current=self.reference_fingerprint,
+        )
+        return self.reference_watcher.start()
 
-        state = self._query_gadm("ADM1", lat, lon, "shapeName")
-        county = self._query_gadm("ADM2", lat, lon, "shapeName")
+    def lookup_city_from_postgres(self, postal_code: str):
+        """(city, locale_name) for a postal code, from the in-memory copy of usps_postal_code_mapping."""
+        if not postal_code:
+            return None, None
 
-        return country, state, county
+        city, locale_name = self.usps_dimension.lookup(postal_code)
+        logging.info(f"🌍 City and locale_name lookup for postal code {postal_code}: {(city, locale_name)}")
+        return (city, locale_name)
 
 
-    # -----------------------------
-    # POSTAL CODE LOOKUP (NO CACHE)
-    # -----------------------------
-    def lookup_postal_code(self, lat: float, lon: float, country: str, state: str):
+    def lookup_location(self, lat: float, lon: float):
         """
-        Deterministic, no-cache postal code lookup.
+        Geocoding engine + USPS lookup for one point. Returns a location
+        dict, or None when country/state cannot be resolved.
         """
+        location = self.geocoding_engine.lookup_one(lat, lon)
+        if location is None:
+            logging.warning("❌ Missing country/state — skipping enrichment")
+            return None
 
         logging.info(
-            f"📮 Postal lookup start | country={country}, state={state}, lat={lat}, lon={lon}"
+            f"✅ {self.geocoding_engine.name} match: {location['country']}, {location['state']}, "
+            f"{location['county']}, postal={location['postal_code']}"
         )
-
-        # Filter WOF by country/state WITHOUT mutating global df
-        state_df = self.wof_df.filter(
-            (pl.col("country") == country) & (pl.col("state") == state)
+        location["city"], location["usps_locale_name"] = self.lookup_city_from_postgres(
+            location["postal_code"]
         )
-
-        logging.info(f"📂 WOF rows after state filter: {len(state_df)}")
-
-        if state_df.is_empty():
-            logging.warning("❌ No WOF rows for state")
-            return None
-
-        # Convert geometries
-        logging.info("🧱 Converting WKT geometries to Shapely polygons")
-        geometries = [wkt_loads(wkt) for wkt in state_df["wkt_geometry"]]
-        state_df = state_df.with_columns(pl.Series("geometry", geometries))
-
-        point = Point(lon, lat)
-        logging.info(f"📍 Search point: {point}")
-
-        # Polygon match loop (slow but explicit)
-        for idx, row in enumerate(state_df.iter_rows(named=True)):
-            geom = row["geometry"]
-            postal = row.get("postal_code")
-
-            if geom is None:
-                continue
-
-            if geom.contains(point) or geom.touches(point):
-                logging.info(f"🎯 POSTAL MATCH FOUND | index={idx}, postal={postal}")
-                return postal
-
-        logging.warning("⚠️ No postal polygon matched this coordinate")
-        return None
+        return location
 
     # -----------------------------
     # MAIN ENTRY POINT
@@ -178,27 +281,39 @@ class WeatherDataLocationSearcher:
             return None
         
         enriched_rows = []
-        country, state, county = self.find_admin_regions(lat, lon)
-
-        if not country or not state:
-            logging.warning("❌ Missing country/state — skipping postal lookup")
-            return None
-
-        postal_code = self.lookup_postal_code(lat, lon, country, state)
-        
-        city, locale_name = self.lookup_city_from_postgres(postal_code)
+        device_id = row.get("device_id")
+        location = None
+        if self.device_memo is not None and device_id:
+            # Read before the lookup picks its engine, see reload_reference_data
+            memo_generation = self.device_memo.generation
+            location = self.device_memo.get(device_id, lat, lon)
+            if location is not None:
+                logging.info(f"📍 Reusing memoized location for device {device_id}")
+
+        if location is None:
+            location = self.lookup_location(lat, lon)
+            if location is None:
+                return None
+            if self.device_memo is not None and device_id:
+                self.device_memo.put(device_id, lat, lon, location, generation=memo_generation)
+
+        nearby_postal_codes = None
+        if self.postal_adjacency is not None:
+            nearby_postal_codes = self.postal_adjacency.get(location["postal_code"])
 
         enriched_rows.append(
             {
-                "postal_code": postal_code,
+                "postal_code": location["postal_code"],
+                "postal_distance_m": location.get("postal_distance_m"),
+                "nearby_postal_codes": nearby_postal_codes,
                 "lat": lat,
                 "lon": lon,
-                "usps_locale_name": locale_name,
-                "country": country,
-                "state": state,
-                "city": city,
-                "county": county,
-                "device_id": row.get("device_id"),
+                "usps_locale_name": location["usps_locale_name"],
+                "country": location["country"],
+                "state": location["state"],
+                "city": location["city"],
+                "county": location["county"],
+                "device_id": device_id,
                 "temp": row.get("temp"),
                 "humidity": row.get("humidity"),
                 "pressure": row.get("pressure"),
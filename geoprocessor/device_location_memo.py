@@ -0,0 +1,151 @@
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from geoprocessor.geodesy import haversine_m
+
+location_fields = [
+    "country",
+    "state",
+    "county",
+    "postal_code",
+    "city",
+    "usps_locale_name",
+    "postal_distance_m",
+]
+
+# SQLite column types; fields not listed are TEXT
+location_field_types = {"postal_distance_m": "REAL"}
+
+
+class DeviceLocationMemo:
+    """
+    Last enrichment result per device_id, reused while the device reports
+    within max_distance_m of the fix the result was computed for.
+
+    The memo is mirrored to a small SQLite file so a restarted consumer is
+    warm immediately. The anchor fix only moves when a device is re-geocoded,
+    so slow drift cannot accumulate past the threshold.
+
+    Safe to share between threads. clear() starts a new generation; a put()
+    tagged with an earlier generation was computed against data that has
+    since been replaced, and is dropped. The file also records the reference
+    data fingerprint its locations were computed against, so use_reference()
+    can drop a store that outlived a reference update.
+    """
+
+    def __init__(self, store_path: str, max_distance_m: float = 50.0):
+        self.store_path = store_path
+        self.max_distance_m = max_distance_m
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(store_path, check_same_thread=False)
+        self.conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS device_locations (
+                device_id TEXT PRIMARY KEY,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                {", ".join(f"{field} {location_field_types.get(field, 'TEXT')}" for field in location_fields)},
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS memo_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # Stores written before a field was added lack its column
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(device_locations)")}
+        for field in location_fields:
+            if field not in columns:
+                self.conn.execute(
+                    f"ALTER TABLE device_locations ADD COLUMN {field} {location_field_types.get(field, 'TEXT')}"
+                )
+        self.conn.commit()
+
+        self.memo = {}
+        for row in self.conn.execute(
+            f"SELECT device_id, lat, lon, {', '.join(location_fields)} FROM device_locations"
+        ):
+            device_id, lat, lon, *values = row
+            self.memo[device_id] = (lat, lon, dict(zip(location_fields, values)))
+        logging.info(f"📍 Device location memo loaded {len(self.memo)} devices from {store_path}")
+
+    def get(self, device_id: str, lat: float, lon: float):
+        """Returns the memoized location dict, or None if unknown or moved too far."""
+        with self.lock:
+            entry = self.memo.get(device_id)
+            if entry is not None:
+                anchor_lat, anchor_lon, location = entry
+                if haversine_m(anchor_lat, anchor_lon, lat, lon) <= self.max_distance_m:
+                    self.hits += 1
+                    return location
+
+            self.misses += 1
+            return None
+
+    def put(self, device_id: str, lat: float, lon: float, location: dict, generation: int = None):
+        """
+        Records a fresh enrichment result as the device's new anchor.
+        generation: self.generation read before the lookup started; the
+        result is dropped when clear() ran since. Returns True when stored.
+        """
+        location = {field: location.get(field) for field in location_fields}
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self.memo[device_id] = (lat, lon, location)
+            self.conn.execute(
+                f"""
+                INSERT OR REPLACE INTO device_locations
+                    (device_id, lat, lon, {", ".join(location_fields)}, updated_at)
+                VALUES ({", ".join("?" for _ in range(len(location_fields) + 4))})
+                """,
+                (
+                    device_id,
+                    lat,
+                    lon,
+                    *(location[field] for field in location_fields),
+                    datetime.utcnow().isoformat(),
+                ),
+            )
+            self.conn.commit()
+            return True
+
+    def clear(self):
+        """Forgets every device, e.g. after the reference data changed."""
+        with self.lock:
+            self.generation += 1
+            self.memo = {}
+            self.conn.execute("DELETE FROM device_locations")
+            self.conn.commit()
+
+    def use_reference(self, fingerprint: dict) -> bool:
+        """
+        Records the reference data fingerprint the memo serves, clearing it
+        first when the stored one differs (e.g. the WOF or GADM data changed
+        while the consumer was down). Returns True when the memo was cleared.
+        """
+        value = json.dumps(fingerprint, sort_keys=True, default=str)
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM memo_meta WHERE key = 'reference_fingerprint'").fetchone()
+            if row is not None and row[0] == value:
+                return False
+
+            stale = row is not None or bool(self.memo)
+            if stale:
+                logging.info("📍 Reference data changed since the memo was written; clearing it")
+                self.generation += 1
+                self.memo = {}
+                self.conn.execute("DELETE FROM device_locations")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO memo_meta (key, value) VALUES ('reference_fingerprint', ?)", (value,)
+            )
+            self.conn.commit()
+            return stale
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
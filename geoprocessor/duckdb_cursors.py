@@ -0,0 +1,22 @@
+import threading
+
+
+class ThreadCursors:
+    """
+    Hands each thread its own cursor on a shared DuckDB connection.
+
+    A DuckDB connection must not be used from several threads at once, but
+    cursors are independent connections to the same database: they see the
+    same tables and loaded extensions, and can run queries concurrently.
+    """
+
+    def __init__(self, con):
+        self.con = con
+        self.local = threading.local()
+
+    def get(self):
+        cursor = getattr(self.local, "cursor", None)
+        if cursor is None:
+            cursor = self.con.cursor()
+            self.local.cursor = cursor
+        return cursor
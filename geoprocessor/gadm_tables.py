@@ -0,0 +1,233 @@
+import logging
+import polars as pl
+
+# ✅ Native DuckDB tables holding the geoBoundaries CGAZ layers
+gadm_table_names = {
+    "ADM0": "gadm_adm0",
+    "ADM1": "gadm_adm1",
+    "ADM2": "gadm_adm2",
+}
+
+gadm_hierarchy_table = "gadm_hierarchy"
+
+
+def gadm_generation_tables(generation: int):
+    """
+    (table names, hierarchy table) for a reloaded generation of the GADM
+    layers, so a new geoBoundaries release can be loaded next to the one
+    being served. Generation 0 is the base names.
+    """
+    if generation == 0:
+        return gadm_table_names, gadm_hierarchy_table
+    table_names = {level: f"{table}_g{generation}" for level, table in gadm_table_names.items()}
+    return table_names, f"{gadm_hierarchy_table}_g{generation}"
+
+
+def drop_gadm_tables(con, table_names: dict, hierarchy_table: str):
+    for table in [hierarchy_table, *table_names.values()]:
+        con.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def existing_tables(con) -> set:
+    """Names of the tables already present on a DuckDB connection."""
+    return {
+        row[0]
+        for row in con.execute(
+            "SELECT table_name FROM information_schema.tables"
+        ).fetchall()
+    }
+
+
+def containment_join_sql(
+    table: str, value_expr: str, alias: str, predicate: str = "ST_Contains", points: str = "pts"
+):
+    """
+    CTE joining every row of a points CTE (_row, x, y, pt), `pts` unless
+    given, against a polygon table in one set-based join. The bounding-box
+    range conditions let DuckDB prune with an inequality join before the
+    exact predicate; the lowest value wins where polygons overlap.
+    """
+    return f"""
+    {alias} AS (
+        SELECT p._row, MIN({value_expr}) AS value
+        FROM {points} p
+        JOIN {table} t
+          ON p.x BETWEEN t.minx AND t.maxx
+         AND p.y BETWEEN t.miny AND t.maxy
+         AND {predicate}(t.geom, p.pt)
+        GROUP BY p._row
+    )"""
+
+
+def load_gadm_tables(
+    con, gadm_paths: dict, levels=("ADM0", "ADM1", "ADM2"), table_names: dict = gadm_table_names
+):
+    """
+    Materializes each GADM GeoPackage layer into a DuckDB table with an
+    R-tree index on geom and bounding-box columns for range-join pruning.
+    Runs once per connection; tables that already exist are left as they are.
+    """
+    existing = existing_tables(con)
+
+    for level in levels:
+        table = table_names[level]
+        if table in existing:
+            continue
+
+        path = gadm_paths.get(level)
+        if not path:
+            logging.warning(f"GADM path missing for {level}")
+            continue
+
+        logging.info(f"📦 Materializing GADM {level} from {path} into {table}")
+        con.execute(
+            f"""
+            CREATE TABLE {table} AS
+            SELECT
+                *,
+                ST_XMin(geom) AS minx,
+                ST_YMin(geom) AS miny,
+                ST_XMax(geom) AS maxx,
+                ST_YMax(geom) AS maxy
+            FROM ST_Read('{path}')
+            """
+        )
+        con.execute(f"CREATE INDEX {table}_geom_idx ON {table} USING RTREE (geom)")
+        count = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        logging.info(f"📊 GADM {level} rows loaded: {count}")
+
+
+class AdminHierarchy:
+    """
+    ADM2 rowid -> (country ISO2, state, county), held both as a frame for
+    batch joins and as a dict for point lookups.
+    """
+
+    def __init__(self, frame: pl.DataFrame):
+        self.frame = frame
+        self.by_id = {
+            adm2_id: (country, state, county)
+            for adm2_id, country, state, county in frame.iter_rows()
+        }
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def get(self, adm2_id):
+        return self.by_id.get(adm2_id)
+
+
+def load_admin_hierarchy(
+    con,
+    country_code_mapping: dict,
+    table_names: dict = gadm_table_names,
+    hierarchy_table: str = gadm_hierarchy_table,
+) -> AdminHierarchy:
+    """
+    Builds the ADM2 -> ADM1 -> ADM0 hierarchy table once per connection and
+    returns it as an AdminHierarchy.
+
+    Parents are resolved by the ADM1/ADM0 polygon containing a point on the
+    surface of each ADM2 polygon, so a single ADM2 containment test answers
+    all three levels afterwards. State or country is None where no parent
+    was found.
+    """
+    if hierarchy_table not in existing_tables(con):
+        logging.info("🧬 Building GADM ADM2 -> ADM1 -> ADM0 hierarchy")
+        joins = ",".join(
+            [
+                containment_join_sql(table_names["ADM0"], "t.shapeGroup", "adm0"),
+                containment_join_sql(table_names["ADM1"], "t.shapeName", "adm1"),
+            ]
+        )
+        hierarchy_df = con.execute(
+            f"""
+            WITH reps AS (
+                SELECT rowid AS _row, shapeName AS county, ST_PointOnSurface(geom) AS pt
+                FROM {table_names["ADM2"]}
+            ),
+            pts AS (
+                SELECT _row, county, ST_X(pt) AS x, ST_Y(pt) AS y, pt FROM reps
+            ),
+            {joins}
+            SELECT
+                pts._row AS adm2_id,
+                pts.county,
+                adm1.value AS state,
+                adm0.value AS country_iso3
+            FROM pts
+            LEFT JOIN adm0 USING (_row)
+            LEFT JOIN adm1 USING (_row)
+            """
+        ).pl()
+        hierarchy_df = hierarchy_df.with_columns(
+            pl.col("country_iso3").replace(country_code_mapping).alias("country")
+        )
+        con.register("hierarchy_df", hierarchy_df.to_arrow())
+        try:
+            con.execute(
+                f"CREATE TABLE {hierarchy_table} AS SELECT * FROM hierarchy_df"
+            )
+        finally:
+            con.unregister("hierarchy_df")
+
+    hierarchy_df = con.execute(
+        f"SELECT adm2_id, country, state, county FROM {hierarchy_table}"
+    ).pl().with_columns(pl.col("adm2_id").cast(pl.Int64))
+    logging.info(f"📊 GADM hierarchy rows loaded: {len(hierarchy_df)}")
+    return AdminHierarchy(hierarchy_df)
+
+
+def lookup_admin_hierarchy(con, hierarchy: AdminHierarchy, lat: float, lon: float):
+    """
+    One ADM2 containment test resolved through the hierarchy. Returns
+    (country, state, county), or None when no ADM2 polygon contains the point.
+    """
+    df = query_gadm_table(con, "ADM2", lat, lon, "rowid AS adm2_id")
+    if df.is_empty():
+        return None
+    return hierarchy.get(df["adm2_id"][0])
+
+
+def query_gadm_table(con, level: str, lat: float, lon: float, columns: str) -> pl.DataFrame:
+    """
+    Point-in-polygon lookup against a materialized GADM table. The point is
+    inlined as a constant so DuckDB can answer it with an R-tree index scan.
+    """
+    table = gadm_table_names[level]
+    return con.execute(
+        f"""
+        SELECT {columns}
+        FROM {table}
+        WHERE ST_Contains(geom, ST_Point({float(lon)}, {float(lat)}))
+        """
+    ).pl()
+
+
+def lookup_gadm_value(con, level: str, lat: float, lon: float, column: str):
+    """Returns the first matching value of column for the point, or None."""
+    df = query_gadm_table(con, level, lat, lon, column)
+    if df.is_empty():
+        return None
+    return df[column][0]
+
+
+def gadm_covers_exclusively(con, level: str, bounds: tuple) -> bool:
+    """
+    True when the (minx, miny, maxx, maxy) box lies strictly inside one
+    polygon of a materialized GADM table and touches no other, i.e. every
+    point in it resolves the same. The box is inlined like the point in
+    query_gadm_table, so the R-tree index answers it without loading the
+    layer into memory.
+    """
+    table = gadm_table_names[level]
+    minx, miny, maxx, maxy = (float(value) for value in bounds)
+    envelope = f"ST_MakeEnvelope({minx}, {miny}, {maxx}, {maxy})"
+    hits, inside = con.execute(
+        f"""
+        SELECT COUNT(*), BOOL_AND(ST_ContainsProperly(geom, {envelope}))
+        FROM {table}
+        WHERE ST_Intersects(geom, {envelope})
+        """
+    ).fetchone()
+    return hits == 1 and bool(inside)
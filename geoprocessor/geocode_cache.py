@@ -0,0 +1,98 @@
+import math
+import sys
+import threading
+from collections import OrderedDict
+
+# Bookkeeping cost of one OrderedDict slot plus its (value, size) tuple
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class GeocodeCache:
+    """
+    Bounded LRU of geocode results keyed on a fixed lat/lon grid cell.
+
+    Nearby fixes from the same device fall into the same cell, so GPS jitter
+    still hits. Callers must only put() a result for a cell they know lies
+    entirely inside the matched polygons, so any point of the cell would
+    have produced the same answer. Safe to share between threads.
+    """
+
+    def __init__(self, cell_size_deg: float = 0.01, max_bytes: int = 64 * 1024 * 1024):
+        self.cell_size_deg = cell_size_deg
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # cell -> (value, size)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def cell_of(self, lat: float, lon: float):
+        return (
+            math.floor(lat / self.cell_size_deg),
+            math.floor(lon / self.cell_size_deg),
+        )
+
+    def cell_bounds(self, lat: float, lon: float):
+        """(minx, miny, maxx, maxy) of the cell containing the point."""
+        row, col = self.cell_of(lat, lon)
+        return (
+            col * self.cell_size_deg,
+            row * self.cell_size_deg,
+            (col + 1) * self.cell_size_deg,
+            (row + 1) * self.cell_size_deg,
+        )
+
+    def get(self, lat: float, lon: float):
+        """Returns the cached result for the point's cell, or None."""
+        key = self.cell_of(lat, lon)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, lat: float, lon: float, value: tuple):
+        """Stores a result for the point's cell, evicting LRU cells over max_bytes."""
+        key = self.cell_of(lat, lon)
+        size = (
+            ENTRY_OVERHEAD_BYTES
+            + sys.getsizeof(key)
+            + sys.getsizeof(value)
+            + sum(sys.getsizeof(v) for v in value if v is not None)
+        )
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+
+            self.entries[key] = (value, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and self.entries:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
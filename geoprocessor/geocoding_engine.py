@@ -0,0 +1,344 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+import polars as pl
+from geoprocessor.admin_index import AdminBoundaryIndex
+from geoprocessor.gadm_tables import (
+    gadm_table_names,
+    load_admin_hierarchy,
+    lookup_admin_hierarchy,
+    lookup_gadm_value,
+)
+from geoprocessor.postal_grid import GRID_AMBIGUOUS
+from geoprocessor.spatial_join import (
+    DuckDBSpatialJoinEnricher,
+    load_wof_table,
+    lookup_wof_postal_code,
+)
+
+# Columns of every lookup_batch result, aligned row for row with the input
+result_columns = ["country", "state", "county", "postal_code", "postal_distance_m"]
+
+
+class GeocodingEngine(ABC):
+    """
+    Resolves points to country, state, county and postal code.
+
+    Backends implement lookup_batch; lookup_one is a batch of one unless a
+    backend has a cheaper single-point path.
+    """
+
+    name = None
+
+    @abstractmethod
+    def lookup_batch(self, lats: np.ndarray, lons: np.ndarray) -> pl.DataFrame:
+        """
+        Returns one row per input point with result_columns, null where a
+        level did not resolve. postal_distance_m is 0 for points inside a
+        postal polygon and the distance for nearest-polygon matches.
+        """
+
+    def lookup_one(self, lat: float, lon: float):
+        """Returns a dict with result_columns, or None when country/state do not resolve."""
+        row = self.lookup_batch(np.array([lat], dtype=float), np.array([lon], dtype=float)).row(
+            0, named=True
+        )
+        if not row["country"] or not row["state"]:
+            return None
+        return row
+
+
+class AdminIndexSet:
+    """ADM layer STRtrees, each loaded from its GADM table on first use."""
+
+    # Value each layer resolves to; ADM2 is keyed by rowid for the admin hierarchy
+    name_columns = {"ADM0": "shapeGroup", "ADM1": "shapeName", "ADM2": "rowid"}
+
+    def __init__(self, cursors, table_names: dict = gadm_table_names):
+        self.cursors = cursors
+        self.table_names = table_names
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def get(self, level: str) -> AdminBoundaryIndex:
+        with self.lock:
+            if level not in self.indexes:
+                self.indexes[level] = AdminBoundaryIndex.from_relation(
+                    self.cursors.get(), self.table_names[level], self.name_columns[level]
+                )
+            return self.indexes[level]
+
+    def load_all(self):
+        """Loads every layer now, after which the set no longer reads its tables."""
+        for level in self.name_columns:
+            self.get(level)
+        return self
+
+
+class STRtreeGeocodingEngine(GeocodingEngine):
+    """
+    In-memory backend: bulk STRtree queries against the ADM layers and the
+    per-state postal polygon shards. One ADM2 query resolves all admin
+    levels through the hierarchy; the coarse layers are only queried for
+    ADM2 hits without parents.
+    """
+
+    name = "strtree"
+
+    def __init__(
+        self,
+        admin_indexes: AdminIndexSet,
+        admin_hierarchy,
+        wof_shards,
+        country_code_mapping: dict,
+        nearest_postal_max_distance_m: float = 0,
+    ):
+        self.admin_indexes = admin_indexes
+        self.admin_hierarchy = admin_hierarchy
+        self.wof_shards = wof_shards
+        self.country_code_mapping = country_code_mapping
+        self.nearest_postal_max_distance_m = nearest_postal_max_distance_m
+
+    def lookup_batch(self, lats, lons):
+        country, state, county = self.resolve_admin(lats, lons)
+        postal_codes, postal_distances = self.resolve_postal(lats, lons, country, state)
+        return pl.DataFrame(
+            {
+                "country": pl.Series(country.tolist(), dtype=pl.Utf8),
+                "state": pl.Series(state.tolist(), dtype=pl.Utf8),
+                "county": pl.Series(county.tolist(), dtype=pl.Utf8),
+                "postal_code": pl.Series(postal_codes.tolist(), dtype=pl.Utf8),
+                "postal_distance_m": pl.Series(postal_distances).fill_nan(None),
+            }
+        )
+
+    def resolve_admin(self, lats, lons):
+        """Object arrays (country, state, county) aligned to the input."""
+        adm2_ids = self.admin_indexes.get("ADM2").lookup_many(lats, lons)
+        regions = pl.DataFrame(
+            {"adm2_id": pl.Series(adm2_ids.tolist(), dtype=pl.Int64)}
+        ).join(self.admin_hierarchy.frame, on="adm2_id", how="left", maintain_order="left")
+        country = regions["country"].to_numpy().astype(object)
+        state = regions["state"].to_numpy().astype(object)
+
+        # Points in ADM2 gaps, or ADM2 hits without parents, fall back to the
+        # coarse layers for those rows only; county stays null in the gaps
+        fallback = (regions["country"].is_null() | regions["state"].is_null()).to_numpy()
+        if fallback.any():
+            country[fallback] = [
+                self.country_code_mapping.get(c, c)
+                for c in self.admin_indexes.get("ADM0").lookup_many(lats[fallback], lons[fallback])
+            ]
+            state[fallback] = self.admin_indexes.get("ADM1").lookup_many(
+                lats[fallback], lons[fallback]
+            )
+
+        return country, state, regions["county"].to_numpy().astype(object)
+
+    def resolve_postal(self, lats, lons, country, state):
+        """
+        Postal codes and distances for the points. Unmatched points get the
+        nearest-polygon fallback when nearest_postal_max_distance_m is set.
+        """
+        postal_codes = np.full(len(lats), None, dtype=object)
+        postal_distances = np.full(len(lats), np.nan)
+        rows = np.arange(len(lats))
+        self.match_polygons(lats, lons, country, state, rows, postal_codes, postal_distances)
+        return postal_codes, postal_distances
+
+    def match_polygons(self, lats, lons, country, state, rows, postal_codes, postal_distances):
+        """Exact per-state polygon lookups for rows, then the bounded nearest fallback."""
+        for (row_country, row_state), group in self.group_rows_by_state(country, state, rows):
+            shard = self.wof_shards.get(row_country, row_state)
+            if shard.index is None:
+                continue
+            postal_codes[group] = shard.index.lookup_many(lats[group], lons[group])
+
+        matched = pl.Series(postal_codes[rows].tolist(), dtype=pl.Utf8).is_not_null().to_numpy()
+        postal_distances[rows[matched]] = 0.0
+
+        unmatched = rows[~matched]
+        if self.nearest_postal_max_distance_m > 0 and len(unmatched):
+            self.match_nearest(lats, lons, country, state, unmatched, postal_codes, postal_distances)
+
+    def match_nearest(self, lats, lons, country, state, rows, postal_codes, postal_distances):
+        """Assigns rows the nearest postal polygon of their state within the configured range."""
+        for (row_country, row_state), group in self.group_rows_by_state(country, state, rows):
+            shard = self.wof_shards.get(row_country, row_state)
+            if shard.index is None:
+                continue
+            postal_codes[group], postal_distances[group] = shard.index.nearest_many(
+                lats[group], lons[group], self.nearest_postal_max_distance_m
+            )
+        assigned = np.count_nonzero(~np.isnan(postal_distances[rows]))
+        logging.info(f"📏 Nearest-polygon fallback assigned {assigned} of {len(rows)} unmatched rows")
+
+    @staticmethod
+    def group_rows_by_state(country, state, rows):
+        """Yields ((country, state), row positions) for the rows with both resolved."""
+        frame = pl.DataFrame(
+            {
+                "_row": rows,
+                "country": pl.Series(country[rows].tolist(), dtype=pl.Utf8),
+                "state": pl.Series(state[rows].tolist(), dtype=pl.Utf8),
+            }
+        ).drop_nulls()
+        for key, group in frame.group_by(["country", "state"]):
+            yield key, group["_row"].to_numpy()
+
+
+class GridRasterGeocodingEngine(STRtreeGeocodingEngine):
+    """
+    STRtree backend with a precomputed postal grid in front: interior and
+    empty cells resolve by array index, only border cells (and points off
+    the grid) go to the polygon shards.
+    """
+
+    name = "grid"
+
+    def __init__(self, postal_grid, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.postal_grid = postal_grid
+
+    def resolve_postal(self, lats, lons, country, state):
+        cell_values = self.postal_grid.lookup_cells(lats, lons)
+        postal_codes = self.postal_grid.postal_codes_for(cell_values)
+        postal_distances = np.where(cell_values >= 0, 0.0, np.nan)
+
+        border = np.flatnonzero(cell_values == GRID_AMBIGUOUS)
+        logging.info(f"🗺️ Postal grid resolved {len(lats) - len(border)} of {len(lats)} rows")
+        self.match_polygons(lats, lons, country, state, border, postal_codes, postal_distances)
+
+        # Empty cells touch no polygon: skip the exact test, but still try the nearest one
+        empty = np.flatnonzero(cell_values < 0)
+        empty = empty[cell_values[empty] != GRID_AMBIGUOUS]
+        if self.nearest_postal_max_distance_m > 0 and len(empty):
+            self.match_nearest(lats, lons, country, state, empty, postal_codes, postal_distances)
+        return postal_codes, postal_distances
+
+
+class DuckDBGeocodingEngine(GeocodingEngine):
+    """
+    Database backend: each batch is registered in DuckDB and resolved with
+    set-based spatial joins against the R-tree indexed GADM and WOF tables,
+    one ADM2 join through the admin hierarchy plus ADM0/ADM1 joins for the
+    rows it leaves without parents; single points use indexed point queries
+    instead. Nothing
+    geometric is held in Python memory. There is no nearest-polygon fallback.
+    """
+
+    name = "duckdb"
+
+    def __init__(
+        self, cursors, country_code_mapping: dict, wof_delta_path: str, admin_hierarchy=None, wof_artifact=None
+    ):
+        """wof_artifact: optional current WOF artifact table the WOF table is loaded from."""
+        self.cursors = cursors
+        self.country_code_mapping = country_code_mapping
+        self.wof_delta_path = wof_delta_path
+        self.wof_artifact = wof_artifact
+        self.admin_hierarchy = admin_hierarchy
+        self.wof_loaded = False
+        self.lock = threading.Lock()
+
+    def ensure_tables(self):
+        """Materializes the WOF table, and the admin hierarchy when none was given."""
+        with self.lock:
+            if not self.wof_loaded:
+                load_wof_table(self.cursors.get(), self.wof_delta_path, self.wof_artifact)
+                self.wof_loaded = True
+            if self.admin_hierarchy is None:
+                self.admin_hierarchy = load_admin_hierarchy(self.cursors.get(), self.country_code_mapping)
+
+    def lookup_one(self, lat, lon):
+        """ADM2 via the admin hierarchy (ADM0/ADM1 when it has no parents), then WOF."""
+        self.ensure_tables()
+        cursor = self.cursors.get()
+        regions = lookup_admin_hierarchy(cursor, self.admin_hierarchy, lat, lon)
+        if regions and regions[0] and regions[1]:
+            country, state, county = regions
+        else:
+            country = lookup_gadm_value(cursor, "ADM0", lat, lon, "shapeGroup")
+            country = self.country_code_mapping.get(country, country)
+            state = lookup_gadm_value(cursor, "ADM1", lat, lon, "shapeName")
+            county = regions[2] if regions else None
+        if not country or not state:
+            return None
+
+        postal_code = lookup_wof_postal_code(cursor, lat, lon)
+        return {
+            "country": country,
+            "state": state,
+            "county": county,
+            "postal_code": postal_code,
+            "postal_distance_m": 0.0 if postal_code is not None else None,
+        }
+
+    def lookup_batch(self, lats, lons):
+        self.ensure_tables()
+
+        resolved = DuckDBSpatialJoinEnricher(self.cursors.get(), self.country_code_mapping).resolve(
+            pl.DataFrame({"lat": lats, "lon": lons}, schema={"lat": pl.Float64, "lon": pl.Float64})
+        )
+        return resolved.select(
+            pl.col("country", "state", "county", "postal_code").cast(pl.Utf8),
+            pl.when(pl.col("postal_code").is_not_null())
+            .then(pl.lit(0.0))
+            .otherwise(pl.lit(None, dtype=pl.Float64))
+            .alias("postal_distance_m"),
+        )
+
+
+# Backends selectable by name, e.g. from the GEOCODING_BACKEND setting
+geocoding_backends = {
+    DuckDBGeocodingEngine.name: DuckDBGeocodingEngine,
+    STRtreeGeocodingEngine.name: STRtreeGeocodingEngine,
+    GridRasterGeocodingEngine.name: GridRasterGeocodingEngine,
+}
+
+
+def build_geocoding_engine(
+    backend: str,
+    cursors,
+    admin_hierarchy,
+    wof_shards,
+    country_code_mapping: dict,
+    wof_delta_path: str,
+    postal_grid=None,
+    admin_indexes: AdminIndexSet = None,
+    nearest_postal_max_distance_m: float = 0,
+    wof_artifact=None,
+) -> GeocodingEngine:
+    """
+    Builds the named backend from the searcher's shared state. "grid" falls
+    back to "strtree" when no postal grid is loaded.
+    """
+    if backend not in geocoding_backends:
+        raise ValueError(
+            f"Unknown geocoding backend {backend!r}; expected one of {sorted(geocoding_backends)}"
+        )
+
+    if backend == DuckDBGeocodingEngine.name:
+        engine = DuckDBGeocodingEngine(
+            cursors, country_code_mapping, wof_delta_path, admin_hierarchy, wof_artifact
+        )
+    else:
+        args = (
+            admin_indexes or AdminIndexSet(cursors),
+            admin_hierarchy,
+            wof_shards,
+            country_code_mapping,
+            nearest_postal_max_distance_m,
+        )
+        if backend == GridRasterGeocodingEngine.name and postal_grid is None:
+            logging.warning("⚠️ No postal grid loaded — using the strtree geocoding backend")
+            backend = STRtreeGeocodingEngine.name
+
+        if backend == GridRasterGeocodingEngine.name:
+            engine = GridRasterGeocodingEngine(postal_grid, *args)
+        else:
+            engine = STRtreeGeocodingEngine(*args)
+
+    logging.info(f"🧭 Geocoding backend: {engine.name}")
+    return engine
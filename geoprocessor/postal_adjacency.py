@@ -0,0 +1,127 @@
+import logging
+import os
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+import shapely
+from shapely import STRtree
+from geoprocessor.geodesy import haversine_m_many
+from geoprocessor.postal_index import geometries_from_frame
+from geoprocessor.reference_watcher import built_from_current_delta
+
+# Nearest postal codes (by centroid) listed for every code, on top of touching ones
+NEARBY_K = 5
+# Polygons closer than this count as touching; WOF borders have slivers and gaps
+ADJACENCY_TOLERANCE_DEG = 0.0005
+# Codes per distance block when ranking k-nearest centroids
+NEAREST_CHUNK_ROWS = 256
+
+
+class PostalAdjacency:
+    """
+    Precomputed postal code -> nearby postal codes table.
+
+    A code's neighbours are the codes whose polygons touch it, plus its
+    k nearest codes by centroid, ordered by great-circle centroid distance.
+    Enrichment attaches them with a join instead of any geometry work per
+    reading.
+
+    source_delta_version is the WOF Delta version the table was built from,
+    kept in the parquet file's schema metadata.
+    """
+
+    def __init__(self, frame: pl.DataFrame, source_delta_version: str = None):
+        # postal_code -> nearby_postal_codes (list[str])
+        self.frame = frame
+        self.source_delta_version = source_delta_version
+        self.by_code = dict(zip(frame["postal_code"].to_list(), frame["nearby_postal_codes"].to_list()))
+
+    @classmethod
+    def build(cls, wof_df: pl.DataFrame, k: int = NEARBY_K, source_delta_version: str = None):
+        """Builds the table from a WOF frame with WKB or WKT geometries and postal codes."""
+        wof_df = wof_df.filter(pl.col("postal_code").is_not_null())
+        geometries = geometries_from_frame(wof_df)
+        codes, code_idx = np.unique(wof_df["postal_code"].cast(pl.Utf8).to_numpy().astype(str), return_inverse=True)
+        logging.info(f"🧭 Building postal adjacency for {len(codes)} codes from {len(geometries)} polygons")
+
+        # One centroid per code, averaged over its polygons
+        centroids = shapely.get_coordinates(shapely.centroid(geometries))
+        counts = np.bincount(code_idx, minlength=len(codes))
+        cx = np.bincount(code_idx, weights=centroids[:, 0], minlength=len(codes)) / counts
+        cy = np.bincount(code_idx, weights=centroids[:, 1], minlength=len(codes)) / counts
+
+        # Touching polygons, lifted to code pairs
+        tree = STRtree(geometries)
+        left, right = tree.query(geometries, predicate="dwithin", distance=ADJACENCY_TOLERANCE_DEG)
+        pairs = np.unique(np.stack([code_idx[left], code_idx[right]], axis=1), axis=0)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        touching = [[] for _ in codes]
+        for a, b in pairs:
+            touching[a].append(b)
+
+        nearby = []
+        kk = min(k, len(codes) - 1)
+        for start in range(0, len(codes), NEAREST_CHUNK_ROWS):
+            end = min(start + NEAREST_CHUNK_ROWS, len(codes))
+            # Metres, not degrees: a longitude degree shrinks with cos(lat)
+            dist = haversine_m_many(cy[start:end, None], cx[start:end, None], cy[None, :], cx[None, :])
+            dist[np.arange(end - start), np.arange(start, end)] = np.inf
+            nearest = np.argpartition(dist, kk - 1, axis=1)[:, :kk] if kk > 0 else np.empty((end - start, 0), dtype=int)
+
+            for row, code in enumerate(range(start, end)):
+                candidates = np.unique(np.concatenate([nearest[row], touching[code]])).astype(int)
+                ordered = candidates[np.argsort(dist[row, candidates], kind="stable")]
+                nearby.append(codes[ordered].tolist())
+
+        frame = pl.DataFrame(
+            {"postal_code": codes.tolist(), "nearby_postal_codes": nearby},
+            schema={"postal_code": pl.Utf8, "nearby_postal_codes": pl.List(pl.Utf8)},
+        )
+        logging.info(f"✅ Postal adjacency built for {len(frame)} codes")
+        return cls(frame, source_delta_version)
+
+    def save(self, path: str):
+        table = self.frame.to_arrow()
+        if self.source_delta_version is not None:
+            table = table.replace_schema_metadata({"source_delta_version": self.source_delta_version})
+        pq.write_table(table, path)
+
+    @classmethod
+    def load(cls, path: str):
+        table = pq.read_table(path)
+        metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+        adjacency = cls(pl.from_arrow(table), metadata.get("source_delta_version"))
+        logging.info(
+            f"🧭 Postal adjacency loaded: {len(adjacency)} codes (Delta version {adjacency.source_delta_version})"
+        )
+        return adjacency
+
+    def __len__(self):
+        return len(self.frame)
+
+    def get(self, postal_code):
+        """Nearby postal codes for one code, None when the code is unknown."""
+        return self.by_code.get(postal_code)
+
+    def attach(self, df: pl.DataFrame) -> pl.DataFrame:
+        """Adds a nearby_postal_codes column looked up from df's postal_code."""
+        return df.drop("nearby_postal_codes", strict=False).join(
+            self.frame, on="postal_code", how="left", maintain_order="left"
+        )
+
+
+def load_postal_adjacency(path: str, wof_delta_path: str):
+    """
+    The adjacency table at path when it was built from the WOF Delta table's
+    current version; None when it is not configured, missing or stale, so
+    no nearby_postal_codes are attached until it is rebuilt.
+    """
+    if not path or not os.path.exists(path):
+        return None
+
+    adjacency = PostalAdjacency.load(path)
+    if not built_from_current_delta(
+        "Postal adjacency", path, adjacency.source_delta_version, wof_delta_path
+    ):
+        return None
+    return adjacency
@@ -0,0 +1,165 @@
+import logging
+import math
+import os
+import numpy as np
+import polars as pl
+import shapely
+from shapely import STRtree
+from geoprocessor.postal_index import geometries_from_frame
+from geoprocessor.reference_watcher import built_from_current_delta
+
+# Cell markers; non-negative values index into PostalGrid.postal_codes
+GRID_EMPTY = -1  # no postal polygon touches the cell
+GRID_AMBIGUOUS = -2  # the cell crosses a polygon boundary
+
+# Rows of cells rasterized per STRtree bulk query while building
+BUILD_CHUNK_ROWS = 64
+
+
+class PostalGrid:
+    """
+    Fixed-resolution raster of the WOF postal polygons.
+
+    Each cell holds a postal code index when it lies strictly inside one
+    polygon, GRID_EMPTY when no polygon touches it, and GRID_AMBIGUOUS when
+    it crosses a boundary. Interior and empty cells answer with an array
+    index; only ambiguous cells (and points off the grid) need exact
+    polygon tests.
+
+    source_delta_version is the WOF Delta version the grid was rasterized
+    from; a grid built from an older version answers with stale codes.
+    """
+
+    def __init__(
+        self,
+        cells: np.ndarray,
+        postal_codes: np.ndarray,
+        minx: float,
+        miny: float,
+        cell_size_deg: float,
+        source_delta_version: str = None,
+    ):
+        self.cells = cells
+        self.postal_codes = postal_codes
+        self.minx = minx
+        self.miny = miny
+        self.cell_size_deg = cell_size_deg
+        self.source_delta_version = source_delta_version
+
+    @classmethod
+    def build(cls, wof_df: pl.DataFrame, cell_size_deg: float = 0.005, source_delta_version: str = None):
+        """Rasterizes the polygons of a WOF frame (WKB or WKT geometries + postal_code)."""
+        geometries = geometries_from_frame(wof_df)
+        postal_codes, code_idx = np.unique(
+            wof_df["postal_code"].cast(pl.Utf8).fill_null("").to_numpy().astype(str),
+            return_inverse=True,
+        )
+        shapely.prepare(geometries)
+        tree = STRtree(geometries)
+
+        minx, miny, maxx, maxy = shapely.total_bounds(geometries)
+        ncols = max(1, math.ceil((maxx - minx) / cell_size_deg))
+        nrows = max(1, math.ceil((maxy - miny) / cell_size_deg))
+        logging.info(f"🗺️ Rasterizing {len(geometries)} postal polygons into {nrows}x{ncols} cells")
+
+        cells = np.full((nrows, ncols), GRID_AMBIGUOUS, dtype=np.int32)
+        col_x0 = minx + np.arange(ncols) * cell_size_deg
+
+        for row_start in range(0, nrows, BUILD_CHUNK_ROWS):
+            row_end = min(row_start + BUILD_CHUNK_ROWS, nrows)
+            row_y0 = miny + np.arange(row_start, row_end) * cell_size_deg
+            x0, y0 = np.meshgrid(col_x0, row_y0)
+            boxes = shapely.box(
+                x0.ravel(), y0.ravel(), x0.ravel() + cell_size_deg, y0.ravel() + cell_size_deg
+            )
+
+            box_idx, geom_idx = tree.query(boxes, predicate="intersects")
+            counts = np.bincount(box_idx, minlength=len(boxes))
+
+            chunk = np.full(len(boxes), GRID_AMBIGUOUS, dtype=np.int32)
+            chunk[counts == 0] = GRID_EMPTY
+
+            # Cells touching exactly one polygon are interior if it contains them
+            single = counts[box_idx] == 1
+            single_box, single_geom = box_idx[single], geom_idx[single]
+            interior = shapely.contains_properly(geometries[single_geom], boxes[single_box])
+            chunk[single_box[interior]] = code_idx[single_geom[interior]]
+
+            cells[row_start:row_end] = chunk.reshape(row_end - row_start, ncols)
+
+        ambiguous = np.count_nonzero(cells == GRID_AMBIGUOUS)
+        logging.info(f"✅ Postal grid built: {ambiguous} of {cells.size} cells ambiguous")
+        return cls(cells, postal_codes, float(minx), float(miny), cell_size_deg, source_delta_version)
+
+    def save(self, path: str):
+        versions = {}
+        if self.source_delta_version is not None:
+            versions["source_delta_version"] = np.array(self.source_delta_version)
+        np.savez_compressed(
+            path,
+            cells=self.cells,
+            postal_codes=self.postal_codes,
+            origin=np.array([self.minx, self.miny, self.cell_size_deg]),
+            **versions,
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            minx, miny, cell_size_deg = data["origin"]
+            source_delta_version = (
+                str(data["source_delta_version"]) if "source_delta_version" in data.files else None
+            )
+            grid = cls(
+                data["cells"],
+                data["postal_codes"],
+                float(minx),
+                float(miny),
+                float(cell_size_deg),
+                source_delta_version,
+            )
+        logging.info(
+            f"🗺️ Postal grid loaded from {path}: {grid.cells.shape[0]}x{grid.cells.shape[1]} cells "
+            f"(Delta version {grid.source_delta_version})"
+        )
+        return grid
+
+    def lookup_cells(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Cell values for arrays of coordinates. Points off the grid (or NaN)
+        come back as GRID_AMBIGUOUS so callers fall through to exact tests.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        nrows, ncols = self.cells.shape
+
+        with np.errstate(invalid="ignore"):
+            rows = np.floor((lats - self.miny) / self.cell_size_deg)
+            cols = np.floor((lons - self.minx) / self.cell_size_deg)
+        inside = (rows >= 0) & (rows < nrows) & (cols >= 0) & (cols < ncols)
+
+        values = np.full(len(lats), GRID_AMBIGUOUS, dtype=np.int32)
+        values[inside] = self.cells[rows[inside].astype(np.int64), cols[inside].astype(np.int64)]
+        return values
+
+    def postal_codes_for(self, values: np.ndarray) -> np.ndarray:
+        """Maps cell values to an object array of postal codes (None where unresolved)."""
+        result = np.full(len(values), None, dtype=object)
+        hit = values >= 0
+        result[hit] = self.postal_codes[values[hit]]
+        return result
+
+
+def load_postal_grid(path: str, wof_delta_path: str):
+    """
+    The grid at path when it was built from the WOF Delta table's current
+    version; None when it is not configured, missing or stale, so the
+    geocoding engine falls back to strtree.
+    """
+    if not path or not os.path.exists(path):
+        return None
+
+    grid = PostalGrid.load(path)
+    if not built_from_current_delta("Postal grid", path, grid.source_delta_version, wof_delta_path):
+        return None
+    return grid
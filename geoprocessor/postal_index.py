@@ -0,0 +1,207 @@
+import logging
+import numpy as np
+import polars as pl
+import shapely
+from shapely import STRtree
+from shapely.geometry import Point
+from geoprocessor.geodesy import METERS_PER_DEGREE, haversine_m_many
+
+# Latitude beyond which the metres -> degrees bound stops widening
+MAX_BOUND_LAT = 85.0
+
+# Half-width of the band around each polygon edge that still needs the exact
+# test (~50 m), and the simplification tolerance of the inner/outer shapes.
+# The tolerance must stay below the band so inner ⊂ polygon ⊂ outer holds.
+EDGE_BAND_DEG = 0.0005
+EDGE_SIMPLIFY_TOLERANCE_DEG = 0.0004
+
+
+def first_matches(point_idx: np.ndarray, tree_idx: np.ndarray, n_points: int) -> np.ndarray:
+    """
+    Reduces the (point, geometry) pairs of a bulk STRtree query to the
+    lowest geometry index per point; -1 where a point matched nothing.
+    """
+    result = np.full(n_points, -1, dtype=np.int64)
+    if len(point_idx) == 0:
+        return result
+
+    order = np.lexsort((tree_idx, point_idx))
+    points, first = np.unique(point_idx[order], return_index=True)
+    result[points] = tree_idx[order][first]
+    return result
+
+
+def degree_bound(max_distance_m: float, lats: np.ndarray) -> float:
+    """
+    A distance in degrees that covers max_distance_m for every latitude in
+    lats: longitude degrees shrink with cos(lat), so the widest bound is at
+    the latitude furthest from the equator.
+    """
+    max_lat = min(float(np.nanmax(np.abs(lats))), MAX_BOUND_LAT)
+    return max_distance_m / (METERS_PER_DEGREE * np.cos(np.radians(max_lat)))
+
+
+def edge_band_geometries(
+    geometries: np.ndarray,
+    band_deg: float = EDGE_BAND_DEG,
+    tolerance_deg: float = EDGE_SIMPLIFY_TOLERANCE_DEG,
+):
+    """
+    Low-vertex (inner, outer) shapes per polygon: inner lies inside the
+    polygon and outer contains it. The polygon is simplified first (cheap,
+    and every edge moves by at most tolerance_deg), then buffered in and out
+    by band_deg > tolerance_deg. Thin polygons may get an empty inner
+    shape, which simply never accepts.
+    """
+    simplified = shapely.simplify(geometries, tolerance_deg)
+    inner = shapely.buffer(simplified, -band_deg, quad_segs=2)
+    outer = shapely.buffer(simplified, band_deg, quad_segs=2)
+    return inner, outer
+
+
+def geometries_from_frame(wof_df: pl.DataFrame) -> np.ndarray:
+    """Parses WOF geometries, preferring the wkb_geometry column over wkt_geometry."""
+    if "wkb_geometry" in wof_df.columns:
+        return shapely.from_wkb(wof_df["wkb_geometry"].to_numpy())
+    return shapely.from_wkt(wof_df["wkt_geometry"].to_numpy())
+
+
+class PostalPolygonIndex:
+    """
+    Spatial index over the WOF postal polygons of one (country, state) shard.
+
+    Geometries are parsed and prepared once at build time. A lookup is a
+    bounding-box probe of the STRtree, then a test against each candidate's
+    simplified inner and outer shapes: inside inner is a hit, outside outer
+    a miss. Only points in the thin band along an edge pay for the exact
+    test against the full-vertex polygon.
+    """
+
+    def __init__(self, geometries: np.ndarray, postal_codes: np.ndarray):
+        self.geometries = geometries
+        self.postal_codes = postal_codes
+        self.inner, self.outer = edge_band_geometries(geometries)
+
+        shapely.prepare(self.geometries)
+        shapely.prepare(self.inner)
+        shapely.prepare(self.outer)
+        self.tree = STRtree(self.geometries)
+
+    @classmethod
+    def from_frame(cls, wof_df: pl.DataFrame):
+        """Builds the index from a WOF frame with WKB or WKT geometries and postal codes."""
+        geometries = geometries_from_frame(wof_df)
+        postal_codes = wof_df["postal_code"].to_numpy()
+        logging.info(f"🌲 Built postal STRtree over {len(geometries)} polygons")
+        return cls(geometries, postal_codes)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def locate(self, lat: float, lon: float):
+        """
+        Returns the shard row position of the polygon containing or touching
+        the point, None when nothing matches.
+
+        When polygons overlap, the first one in shard order wins, matching the
+        previous row-by-row scan.
+        """
+        _, matches = self.intersecting_pairs(np.array([Point(lon, lat)]))
+        if len(matches) == 0:
+            return None
+
+        return int(matches.min())
+
+    def intersecting_pairs(self, points: np.ndarray):
+        """
+        (point, polygon) index pairs where the polygon intersects the point,
+        as tree.query(points, predicate="intersects") would return them, but
+        with the exact test limited to points in a polygon's edge band.
+        """
+        point_idx, tree_idx = self.tree.query(points)
+        candidates = points[point_idx]
+
+        inside = shapely.contains(self.inner[tree_idx], candidates)
+        band = ~inside & shapely.intersects(self.outer[tree_idx], candidates)
+        exact = np.zeros(len(point_idx), dtype=bool)
+        exact[band] = shapely.intersects(self.geometries[tree_idx[band]], candidates[band])
+
+        hit = inside | exact
+        return point_idx[hit], tree_idx[hit]
+
+    def covers_exclusively(self, bounds: tuple, allow_empty: bool = False) -> bool:
+        """
+        True when the (minx, miny, maxx, maxy) box lies strictly inside one
+        polygon and touches no other, i.e. every point in it gets the same
+        answer. With allow_empty, a box touching no polygon also qualifies.
+        """
+        cell = shapely.box(*bounds)
+        hits = self.tree.query(cell, predicate="intersects")
+        if len(hits) == 0:
+            return allow_empty
+        return len(hits) == 1 and shapely.contains_properly(self.geometries[hits[0]], cell)
+
+    def lookup_many(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Vectorized lookup for arrays of coordinates. Returns an object array of
+        postal codes aligned to the input, None where no polygon matched.
+        """
+        points = shapely.points(lons, lats)
+        point_idx, tree_idx = self.intersecting_pairs(points)
+        matched = first_matches(point_idx, tree_idx, len(points))
+
+        result = np.full(len(points), None, dtype=object)
+        hit = matched >= 0
+        result[hit] = self.postal_codes[matched[hit]]
+        return result
+
+    def nearest(self, lat: float, lon: float, max_distance_m: float):
+        """
+        Nearest postal polygon within max_distance_m of the point, for points
+        no polygon contains. Returns (postal_code, distance_m), or
+        (None, None) when nothing is that close.
+        """
+        postal_codes, distances = self.nearest_many(
+            np.array([lat], dtype=float), np.array([lon], dtype=float), max_distance_m
+        )
+        if postal_codes[0] is None:
+            return None, None
+        return postal_codes[0], float(distances[0])
+
+    def nearest_many(self, lats: np.ndarray, lons: np.ndarray, max_distance_m: float):
+        """
+        Vectorized nearest(). Every polygon within a degree distance covering
+        max_distance_m is a candidate; a degree of longitude is shorter than
+        one of latitude, so the nearest in degrees need not be the nearest in
+        metres. The great-circle distance to the closest point of each
+        candidate is computed and the smallest one per point kept, if within
+        max_distance_m. Returns an object array of postal codes (None where
+        nothing is close enough) and a float array of metres (NaN there).
+        """
+        postal_codes = np.full(len(lats), None, dtype=object)
+        distances = np.full(len(lats), np.nan)
+        if len(lats) == 0:
+            return postal_codes, distances
+
+        points = shapely.points(lons, lats)
+        point_idx, tree_idx = self.tree.query(
+            points, predicate="dwithin", distance=degree_bound(max_distance_m, lats)
+        )
+        if len(point_idx) == 0:
+            return postal_codes, distances
+
+        # Closest point on each candidate polygon's boundary, then metres to it
+        closest = shapely.get_coordinates(
+            shapely.shortest_line(points[point_idx], self.geometries[tree_idx])
+        )[1::2]
+        metres = haversine_m_many(lats[point_idx], lons[point_idx], closest[:, 1], closest[:, 0])
+
+        # Smallest distance per point; ties go to the lowest polygon index
+        order = np.lexsort((tree_idx, metres, point_idx))
+        nearest_points, first = np.unique(point_idx[order], return_index=True)
+        best = order[first]
+
+        within = metres[best] <= max_distance_m
+        postal_codes[nearest_points[within]] = self.postal_codes[tree_idx[best[within]]]
+        distances[nearest_points[within]] = metres[best[within]]
+        return postal_codes, distances
@@ -0,0 +1,103 @@
+import logging
+import os
+import threading
+from deltalake import DeltaTable
+
+# How often the reference data sources are checked for a new version
+REFERENCE_POLL_SECONDS = 300
+
+
+def delta_table_version(path: str):
+    """Current version of a Delta table, None when it cannot be read."""
+    try:
+        return DeltaTable(path).version()
+    except Exception:
+        logging.exception(f"❌ Could not read Delta version of {path}")
+        return None
+
+
+def built_from_current_delta(name: str, path: str, source_delta_version, delta_path: str) -> bool:
+    """
+    True when a file prebuilt from a Delta table (artifact, grid, adjacency)
+    records the table's current version. A stale or unversioned file is
+    logged and refused, so callers ignore it until it is rebuilt. When the
+    Delta version cannot be read, the file is trusted.
+    """
+    delta_version = delta_table_version(delta_path)
+    if delta_version is None:
+        logging.warning(f"⚠️ Delta version of {delta_path} unknown, trusting {name} {path}")
+        return True
+
+    if source_delta_version != str(delta_version):
+        logging.warning(
+            f"⚠️ {name} {path} was built from Delta version {source_delta_version}, "
+            f"{delta_path} is at {delta_version} — ignoring it until it is rebuilt"
+        )
+        return False
+    return True
+
+
+def file_mtime(path: str):
+    """Modification time of a file, None when it is not configured or missing."""
+    if not path or not os.path.exists(path):
+        return None
+    return os.path.getmtime(path)
+
+
+class ReferenceDataWatcher:
+    """
+    Polls a fingerprint of the reference data (Delta versions, file mtimes)
+    from a daemon thread and calls reload(fingerprint) when it changes.
+
+    reload runs on the watcher thread, so the cold build happens off the
+    lookup path; it is expected to swap its result in with a single
+    assignment. A failed reload keeps the current data and is retried on
+    the next poll.
+    """
+
+    def __init__(self, fingerprint, reload, poll_seconds: float = REFERENCE_POLL_SECONDS, current=None):
+        """current: fingerprint of the data already loaded; read now when not given."""
+        self.fingerprint = fingerprint
+        self.reload = reload
+        self.poll_seconds = poll_seconds
+        self.current = current if current is not None else fingerprint()
+        self.reloads = 0
+        self.failures = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name="reference-watcher", daemon=True
+        )
+        self.thread.start()
+        logging.info(f"👀 Watching reference data every {self.poll_seconds}s: {self.current}")
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        while not self.stop_event.wait(self.poll_seconds):
+            self.check()
+
+    def check(self) -> bool:
+        """One poll; returns True when new reference data was swapped in."""
+        fingerprint = self.fingerprint()
+        if fingerprint == self.current:
+            return False
+
+        logging.info(f"🔄 Reference data changed: {self.current} -> {fingerprint}")
+        try:
+            self.reload(fingerprint)
+        except Exception:
+            self.failures += 1
+            logging.exception("❌ Reference data reload failed, keeping the current data")
+            return False
+
+        self.current = fingerprint
+        self.reloads += 1
+        logging.info("✅ Reference data swapped in")
+        return True
@@ -1,18 +1,39 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from deltalake import DeltaTable
 import logging
 import polars as pl
 import geopandas as gpd
 from shapely.geometry import Point
 from shapely import wkb
-from shapely.wkt import loads as wkt_loads
 import duckdb
-from datetime import datetime, timedelta
 from DataFrameCache import DataFrameCache
+from geoprocessor.duckdb_cursors import ThreadCursors
+from geoprocessor.geocode_cache import GeocodeCache
+from geoprocessor.gadm_tables import (
+    gadm_covers_exclusively,
+    load_admin_hierarchy,
+    load_gadm_tables,
+    lookup_admin_hierarchy,
+    query_gadm_table,
+)
+from geoprocessor.postal_adjacency import load_postal_adjacency
+from geoprocessor.geocoding_engine import (
+    AdminIndexSet,
+    DuckDBGeocodingEngine,
+    build_geocoding_engine,
+    result_columns,
+)
+from geoprocessor.postal_grid import load_postal_grid
+from geoprocessor.wof_artifact import open_wof_artifact, wof_artifact_is_current
+from geoprocessor.wof_shards import WofShardStore, artifact_shard_loader, delta_shard_loader
 
 con = duckdb.connect()
 con.execute("INSTALL spatial; LOAD spatial;")
 con.execute("INSTALL delta; LOAD delta;")
+# Lookups go through a per-thread cursor so enrichment threads never share `con`
+cursors = ThreadCursors(con)
 
 # ✅ Define Paths for GADM & WOF Data
 # read_paths = {
@@ -29,6 +50,20 @@ read_paths = {
     "WOF": "/home/resources/deltalake-wof-oregon",
 }
 
+# Built offline by manual-scripts/build_postal_grid.py; skipped if missing or stale
+POSTAL_GRID_PATH = "/home/resources/wof-oregon-postal-grid.npz"
+# Built offline by manual-scripts/build_postal_adjacency.py; skipped if missing or stale
+POSTAL_ADJACENCY_PATH = "/home/resources/wof-oregon-postal-adjacency.parquet"
+# Built offline by manual-scripts/build_wof_artifact.py; falls back to Delta if missing or stale
+WOF_ARTIFACT_PATH = "/home/resources/wof-oregon.arrow"
+# Batch geocoding backend: "grid" (postal grid + STRtree), "strtree" or "duckdb"
+GEOCODING_BACKEND = os.getenv("GEOCODING_BACKEND", "grid")
+# Points outside every postal polygon take the nearest one within this many
+# metres; 0 disables the fallback
+NEAREST_POSTAL_MAX_DISTANCE_M = float(os.getenv("NEAREST_POSTAL_MAX_DISTANCE_M", "0"))
+# Memory budget for WOF shards held per (country, state)
+WOF_SHARD_MAX_BYTES = int(os.getenv("WOF_SHARD_MAX_BYTES", str(512 * 1024 * 1024)))
+
 read_paths_dev = {
     "ADM0": "C:\\datasnake\\prab\\dev\\datasnake-sensor-data\\geoBoundariesCGAZ_ADM0.gpkg",
     "ADM1": "C:\\datasnake\\prab\\dev\\datasnake-sensor-data\\geoBoundariesCGAZ_ADM1.gpkg",
@@ -69,24 +104,105 @@ country_code_mapping = {
     "MEX": "MX",
     "ZAF": "ZA",
 }
-gadm_cache = DataFrameCache(expiration_minutes=60)
-wof_cache = DataFrameCache(expiration_minutes=60)
-wof_location_cache = DataFrameCache(expiration_minutes=60)
-wof_cache_key_full = f"wof_cache_full"
+# Per-point GADM results, LRU-bounded by entries and bytes (WOF frames live in
+# the WofShardStore). Kept in memory only: the keys are exact coordinates,
+# which a restarted process would almost never ask for again.
+gadm_cache = DataFrameCache(
+    expiration_minutes=60,
+    max_entries=int(os.getenv("GADM_CACHE_MAX_ENTRIES", "50000")),
+    max_bytes=int(os.getenv("GADM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    # Point keys are rarely read again, so expired ones are swept rather than left to LRU
+    sweep_interval_seconds=300,
+)
+# Point results keyed on a lat/lon grid cell; only uniform cells are stored
+geocode_cache = GeocodeCache(
+    cell_size_deg=float(os.getenv("GEOCODE_CACHE_CELL_DEG", "0.01")),
+    max_bytes=int(os.getenv("GEOCODE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+# Threaded enrichment: worker threads and rows per micro-batch
+ENRICHMENT_THREADS = int(os.getenv("ENRICHMENT_THREADS", "4"))
+ENRICHMENT_MICRO_BATCH_ROWS = int(os.getenv("ENRICHMENT_MICRO_BATCH_ROWS", "1000"))
 FAILED_RECORDS_FILE = "failed_records.csv"
 
+# Output columns of the enrichment paths, in write order
+enriched_columns = [
+    "postal_code",
+    "postal_distance_m",
+    "nearby_postal_codes",
+    "lat",
+    "lon",
+    "country",
+    "state",
+    "city",
+    "device_id",
+    "temp",
+    "humidity",
+    "pressure",
+    "alt",
+    "sats",
+    "wind_speed",
+    "wind_direction",
+    "usps_locale_name",
+    "timestamp",
+]
+
+
+def finalize_enriched_frame(df):
+    """Drops placeholder 00000 postal codes and projects to enriched_columns."""
+    df = df.filter(pl.col("postal_code").is_null() | (pl.col("postal_code") != "00000"))
+    return df.select(
+        pl.col(c) if c in df.columns else pl.lit(None).alias(c)
+        for c in enriched_columns
+    )
+
 
 class WeatherDataLocationSearcher:
-    def __init__(self, delta_wof_path):
-        self.wof_df = pl.scan_delta(delta_wof_path).collect()
-        # cached_data = wof_cache.get(wof_cache_key)
-        # if cached_data is not None:
-        #     print(f"Using cached data for: {delta_wof_path}")
-        #     self.wof_df = cached_data
-        # else:
-        #     print("read fresh deltatable and set cache:")
-        #     self.wof_df = pl.scan_delta(delta_wof_path).collect()
-        #     wof_cache.set(wof_cache_key, self.wof_df)
+    def __init__(
+        self,
+        delta_wof_path,
+        postal_grid_path=POSTAL_GRID_PATH,
+        wof_artifact_path=WOF_ARTIFACT_PATH,
+        postal_adjacency_path=POSTAL_ADJACENCY_PATH,
+        usps_dimension=None,
+        geocoding_backend=GEOCODING_BACKEND,
+        gadm_paths=read_paths,
+    ):
+        self.delta_wof_path = delta_wof_path
+        # WOF shards (frame + postal STRtree) per (country, state), loaded on first use
+        self.wof_artifact = None
+        if wof_artifact_is_current(wof_artifact_path, delta_wof_path):
+            self.wof_artifact = open_wof_artifact(wof_artifact_path)
+            loader = artifact_shard_loader(self.wof_artifact)
+        else:
+            loader = delta_shard_loader(delta_wof_path)
+        self.wof_shards = WofShardStore(loader, max_bytes=WOF_SHARD_MAX_BYTES)
+        load_gadm_tables(con, gadm_paths)
+        self.admin_hierarchy = load_admin_hierarchy(con, country_code_mapping)
+        # ADM layer STRtrees, shared by the row path and the STRtree backends
+        self.admin_indexes = AdminIndexSet(cursors)
+        # Guards lazy builds shared by enrichment threads
+        self.build_lock = threading.Lock()
+        self.enrichment_pool = None
+        self.postal_grid = load_postal_grid(postal_grid_path, delta_wof_path)
+        # Optional UspsPostalDimension; batch paths join usps_locale_name from it
+        self.usps_dimension = usps_dimension
+        self.postal_adjacency = load_postal_adjacency(postal_adjacency_path, delta_wof_path)
+
+        self.geocoding_engine = build_geocoding_engine(
+            geocoding_backend,
+            cursors,
+            self.admin_hierarchy,
+            self.wof_shards,
+            country_code_mapping,
+            delta_wof_path,
+            postal_grid=self.postal_grid,
+            admin_indexes=self.admin_indexes,
+            nearest_postal_max_distance_m=NEAREST_POSTAL_MAX_DISTANCE_M,
+            wof_artifact=self.wof_artifact,
+        )
+        self.duckdb_engine = (
+            self.geocoding_engine if self.geocoding_engine.name == "duckdb" else None
+        )
 
     def query_gadm_level(
         self, read_path, lat, long, level, geom_column, extract_column
@@ -96,34 +212,18 @@ class WeatherDataLocationSearcher:
         gadm_cache_key = (long, lat, level)
         # print("cache key:", gadm_cache_key)
 
-        # Check the cache using the correct cache object
-        cached_df = gadm_cache.get(gadm_cache_key)
-        if cached_df is not None:
-            # print("reading from gadm_cache", cached_df)
-            return pl.from_pandas(cached_df)  # Convert back to Polars DataFrame
-
         if any(x is None for x in [read_path, lat, long, geom_column]):
             print(
                 f"Invalid parameters for querying {level}: {read_path}, {lat}, {long}, {geom_column}"
             )
             return None
 
-        # Construct the query
-        gadm_query = f"""
-        SELECT {extract_column} FROM ST_Read('{read_path}') 
-        WHERE ST_Contains({geom_column}, ST_Point({long}, {lat}))
-        """
-
-        # Execute the query and get the DataFrame
-        gadm_df = con.execute(gadm_query).pl()
-        # print("gadm_df.head() after duckdb search:")
-        # print(gadm_df.head())
-
-        # Set the cache with the DataFrame converted to Pandas
-        # print("setting gadm cache")
-        gadm_cache.set(
-            gadm_cache_key, gadm_df.to_pandas()
-        )  # Convert to Pandas DataFrame for caching
+        # Query the materialized, R-tree indexed layer; threads missing the
+        # same point wait for one query instead of each running it
+        gadm_df = gadm_cache.get_or_compute(
+            gadm_cache_key,
+            lambda: query_gadm_table(cursors.get(), level, lat, long, extract_column),
+        )
 
         if gadm_df.is_empty():
             print(f"No match found in {level} for ({lat}, {long})")
@@ -132,6 +232,22 @@ class WeatherDataLocationSearcher:
         return gadm_df
 
     def find_location(self, lat, lon):
+        """
+        Returns (country, state, city) based on lat/lon using one ADM2 lookup
+        resolved through the admin hierarchy.
+        """
+        regions = lookup_admin_hierarchy(cursors.get(), self.admin_hierarchy, lat, lon)
+        if regions is None:
+            # No ADM2 polygon: the per-level path would give up here too
+            return None, None, None
+
+        country, state, city_county = regions
+        if country and state:
+            return country, state, city_county
+
+        return self.find_location_by_level(lat, lon)
+
+    def find_location_by_level(self, lat, lon):
         """Returns (country, state, city) based on lat/lon using GADM layers."""
 
         adm0_result = self.query_gadm_level(
@@ -252,60 +368,17 @@ class WeatherDataLocationSearcher:
         return country, state, None
 
     def query_wof_level_deltatable_pyarrow_query(self, country, state, city, lat, lon):
-        # print(f"inside query wof deltatable pyarrow :", state)
-        # state_partition_path = f"/home/resources/deltalake-wof/country={country}/state={state}"
-        wof_cache_country_state_key = f"{country}-{state}"
-        wof_location_cache_country_state_lat_long_key = f"{country}-{state}-{lat}-{lon}"
-        # print("wof_cache_country_state_key")
-        # print(wof_cache_country_state_key)
+        """
+        Returns the WOF row whose postal polygon contains the point. The
+        (country, state) shard is loaded once with its geometries parsed and
+        indexed; it is shared read-only by every lookup, so batches mixing
+        states each hit their own shard.
+        """
         if not all([country, state, lat, lon]):
             return None
 
         try:
-            cached_df = wof_cache.get(wof_cache_country_state_key)
-            cached_location = wof_cache.get(
-                wof_location_cache_country_state_lat_long_key
-            )
-            if cached_location is not None:
-                print("returning the cached location:", cached_location)
-                return
-            if cached_df is not None:
-                logging.info(f"Reading from wof_cache: {cached_df}")
-                search_point = Point(lon, lat)
-
-                for row in cached_df.iter_rows(named=True):
-                    geom = row.get("geometry")
-                    logging.info(f"row: {row}")
-                    logging.info(f"geom: {geom}")
-                    if geom and (
-                        geom.contains(search_point) or geom.equals(search_point)
-                    ):
-                        return pl.DataFrame(row)
-
-            self.wof_df = self.wof_df.filter(
-                (pl.col("country") == country) & (pl.col("state") == state)
-            )
-            logging.info(f"Filtered wof_df on country state: {self.wof_df}")
-            self.wof_df = self.wof_df.with_columns(
-                pl.Series(
-                    "geometry",
-                    [wkt_loads(wkt) for wkt in self.wof_df["wkt_geometry"]],
-                )
-            )
-            logging.info(f"Added geometry column to wof_df: {self.wof_df}")
-            wof_cache.set(wof_cache_country_state_key, self.wof_df)
-            logging.info("what wof cache did you set: ", wof_cache.get(wof_cache_country_state_key))
-            search_point = Point(lon, lat)
-
-            for row in self.wof_df.iter_rows(named=True):
-                geom = row.get("geometry")
-                if geom and (geom.contains(search_point) or geom.equals(search_point)):
-                    wof_location_cache.set(
-                        wof_location_cache_country_state_lat_long_key, pl.DataFrame(row)
-                    )
-                    logging.info("what wof location cache should you set: ", pl.DataFrame(row))
-                    logging.info("what wof location cache did you set: ", wof_location_cache.get(wof_location_cache_country_state_lat_long_key))
-                    return pl.DataFrame(row)
+            return self.wof_shards.get(country, state).match(lat, lon)
         except Exception as e:
             logging.exception(f"Error in WOF query: {e}")
         return None
@@ -431,6 +504,41 @@ class WeatherDataLocationSearcher:
 
             # return None  # Skip this record
 
+    def geocode(self, lat, lon):
+        """
+        Returns (country, state, city, postal_code) for a point. Results are
+        served from geocode_cache when the point's grid cell was previously
+        found to lie inside a single ADM2 and a single postal polygon.
+        """
+        cached = geocode_cache.get(lat, lon)
+        if cached is not None:
+            return cached
+
+        country, state, city = self.find_location(lat, lon)
+        if not country or not state:
+            return country, state, city, None
+
+        wof_result = self.query_wof_level_deltatable_pyarrow_query(
+            country, state, city, lat, lon
+        )
+        logging.info(f"came back with wof_result: {wof_result}")
+        postal_code = (
+            wof_result["postal_code"].item(0)
+            if wof_result is not None and not wof_result.is_empty()
+            else None
+        )
+        result = (country, state, city, postal_code)
+
+        # Only cache cells where every point would have produced this result
+        bounds = geocode_cache.cell_bounds(lat, lon)
+        postal_index = self.get_postal_index(country, state)
+        if gadm_covers_exclusively(cursors.get(), "ADM2", bounds) and (
+            postal_index is None or postal_index.covers_exclusively(bounds, allow_empty=True)
+        ):
+            geocode_cache.put(lat, lon, result)
+
+        return result
+
     def enrich_weather_data_optimized(self, weather_data_df):
         try:
             logging.info(f"total rows incoming: {len(weather_data_df)}")
@@ -447,24 +555,11 @@ class WeatherDataLocationSearcher:
                     # logging.info(f"found None lat or long : {lat} :: {lon}")
                     continue
 
-                country, state, city = self.find_location(lat, lon)
+                country, state, city, postal_code = self.geocode(lat, lon)
                 if not country or not state:
                     # logging.info(f"found None country or state : {country} : {state}")
                     continue
 
-                t1 = datetime.now()
-                wof_result = self.query_wof_level_deltatable_pyarrow_query(
-                    country, state, city, lat, lon
-                )
-                t2 = datetime.now()
-                total = t2 - t1
-                
-                logging.info(f"came back with wof_result: {wof_result}")
-                postal_code = (
-                    wof_result["postal_code"].item(0)
-                    if wof_result is not None and not wof_result.is_empty()
-                    else None
-                )
                 # logging.info(
                 #     f"postal code: {postal_code} is of type {type(postal_code)}"
                 # )
@@ -480,6 +575,7 @@ class WeatherDataLocationSearcher:
                 enriched_rows.append(
                     {
                         "postal_code": postal_code,
+                        "nearby_postal_codes": self.nearby_postal_codes(postal_code),
                         "lat": lat,
                         "lon": lon,
                         "country": country,
@@ -499,7 +595,128 @@ class WeatherDataLocationSearcher:
                     }
                 )
             logging.info(f"Length of enriched_rows array: {len(enriched_rows)}")
-            return pl.DataFrame(enriched_rows) if enriched_rows else pl.DataFrame([])
+            logging.info(f"geocode cache stats: {geocode_cache.stats()}")
+            logging.info(f"gadm cache stats: {gadm_cache.stats()}")
+            if not enriched_rows:
+                return pl.DataFrame([])
+            return self.attach_usps_locale_name(pl.DataFrame(enriched_rows))
 
         except Exception as e:
             raise e
+
+    # -----------------------------
+    # NEARBY POSTAL CODES
+    # -----------------------------
+    def nearby_postal_codes(self, postal_code):
+        """Precomputed neighbours of one postal code; None without an adjacency table."""
+        if self.postal_adjacency is None:
+            return None
+        return self.postal_adjacency.get(postal_code)
+
+    def attach_nearby_postal_codes(self, df):
+        """Adds nearby_postal_codes to a frame with postal_code, by table join."""
+        if self.postal_adjacency is None:
+            return df
+        return self.postal_adjacency.attach(df)
+
+    def attach_usps_locale_name(self, df):
+        """Adds usps_locale_name to a frame with postal_code, by table join."""
+        if self.usps_dimension is None:
+            return df
+        return self.usps_dimension.attach(df, columns=("usps_locale_name",))
+
+    # -----------------------------
+    # VECTORIZED BATCH ENRICHMENT
+    # -----------------------------
+    def get_admin_index(self, level):
+        """
+        Loads one ADM layer into an STRtree on first use. ADM2 is keyed by
+        rowid so hits resolve through the admin hierarchy.
+        """
+        return self.admin_indexes.get(level)
+
+    def get_postal_index(self, country, state):
+        """Returns the postal STRtree for a (country, state), None when it has no rows."""
+        return self.wof_shards.get(country, state).index
+
+    def enrich_with_engine(self, weather_data_df, engine):
+        """
+        Resolves a whole batch with one lookup_batch call on a geocoding
+        engine and attaches the location columns; rows are dropped by the
+        same rules as the per-row path.
+        """
+        if weather_data_df is None or weather_data_df.is_empty():
+            return pl.DataFrame([])
+        logging.info(f"total rows incoming: {len(weather_data_df)} ({engine.name} backend)")
+
+        df = weather_data_df.filter(
+            pl.col("lat").is_not_null() & pl.col("lon").is_not_null()
+        )
+        resolved = engine.lookup_batch(
+            df["lat"].cast(pl.Float64).to_numpy(), df["lon"].cast(pl.Float64).to_numpy()
+        )
+
+        df = (
+            df.drop([*result_columns, "city"], strict=False)
+            .hstack(resolved)
+            .rename({"county": "city"})
+            .filter(
+                pl.col("country").is_not_null()
+                & pl.col("state").is_not_null()
+                & pl.col("city").is_not_null()
+            )
+        )
+        enriched_df = finalize_enriched_frame(
+            self.attach_usps_locale_name(self.attach_nearby_postal_codes(df))
+        )
+        logging.info(f"Length of enriched rows: {len(enriched_df)}")
+        return enriched_df
+
+    def enrich_weather_data_vectorized(self, weather_data_df):
+        """Batch counterpart of enrich_weather_data_optimized, on the configured backend."""
+        return self.enrich_with_engine(weather_data_df, self.geocoding_engine)
+
+    def enrich_weather_data_threaded(self, weather_data_df):
+        """
+        Splits the batch into micro-batches and runs enrich_weather_data_vectorized
+        on them from a thread pool. Each thread queries DuckDB through its own
+        cursor, and the bulk Shapely predicates and DuckDB queries release the
+        GIL, so micro-batches overlap within one process. Output keeps input order.
+        """
+        if weather_data_df is None or weather_data_df.is_empty():
+            return pl.DataFrame([])
+
+        if self.enrichment_pool is None:
+            self.enrichment_pool = ThreadPoolExecutor(
+                max_workers=ENRICHMENT_THREADS, thread_name_prefix="enrich"
+            )
+
+        micro_batches = weather_data_df.iter_slices(ENRICHMENT_MICRO_BATCH_ROWS)
+        enriched = [
+            df
+            for df in self.enrichment_pool.map(self.enrich_weather_data_vectorized, micro_batches)
+            if df.width > 0
+        ]
+        if not enriched:
+            return pl.DataFrame([])
+
+        enriched_df = pl.concat(enriched, how="vertical_relaxed")
+        logging.info(f"Length of enriched rows (threaded): {len(enriched_df)}")
+        return enriched_df
+
+    def enrich_weather_data_spatial_join(self, weather_data_df):
+        """
+        Batch enrichment pushed down to DuckDB, whatever the configured
+        backend: set-based joins against the materialized GADM and WOF
+        tables, admin levels resolved through the ADM2 hierarchy.
+        """
+        with self.build_lock:
+            if self.duckdb_engine is None:
+                self.duckdb_engine = DuckDBGeocodingEngine(
+                    cursors,
+                    country_code_mapping,
+                    self.delta_wof_path,
+                    self.admin_hierarchy,
+                    self.wof_artifact,
+                )
+        return self.enrich_with_engine(weather_data_df, self.duckdb_engine)
@@ -0,0 +1,196 @@
+import logging
+import polars as pl
+from geoprocessor.gadm_tables import (
+    containment_join_sql,
+    existing_tables,
+    gadm_hierarchy_table,
+    gadm_table_names,
+)
+
+wof_table_name = "wof_postal"
+
+
+def load_wof_table(con, wof_delta_path: str, wof_artifact=None):
+    """
+    Materializes the WOF postal Delta table into a DuckDB table with parsed
+    geometries and bounding-box columns. Runs once per connection.
+
+    wof_artifact: the memory-mapped artifact table (open_wof_artifact), when
+    current; its WKB and precomputed bounds are loaded as they are instead of
+    parsing WKT and computing bounds from the Delta table.
+    """
+    if wof_table_name in existing_tables(con):
+        return
+
+    if wof_artifact is not None:
+        logging.info(f"📦 Materializing WOF artifact into {wof_table_name}")
+        con.register("wof_artifact", wof_artifact)
+        try:
+            con.execute(
+                f"""
+                CREATE TABLE {wof_table_name} AS
+                SELECT
+                    country,
+                    state,
+                    postal_code,
+                    ST_GeomFromWKB(wkb_geometry) AS geom,
+                    minx,
+                    miny,
+                    maxx,
+                    maxy
+                FROM wof_artifact
+                """
+            )
+        finally:
+            con.unregister("wof_artifact")
+        con.execute(
+            f"CREATE INDEX {wof_table_name}_geom_idx ON {wof_table_name} USING RTREE (geom)"
+        )
+        return
+
+    logging.info(f"📦 Materializing WOF {wof_delta_path} into {wof_table_name}")
+    con.execute(
+        f"""
+        CREATE TABLE {wof_table_name} AS
+        SELECT
+            country,
+            state,
+            postal_code,
+            geom,
+            ST_XMin(geom) AS minx,
+            ST_YMin(geom) AS miny,
+            ST_XMax(geom) AS maxx,
+            ST_YMax(geom) AS maxy
+        FROM (
+            SELECT country, state, postal_code, ST_GeomFromText(wkt_geometry) AS geom
+            FROM delta_scan('{wof_delta_path}')
+        )
+        """
+    )
+    con.execute(
+        f"CREATE INDEX {wof_table_name}_geom_idx ON {wof_table_name} USING RTREE (geom)"
+    )
+
+
+def lookup_wof_postal_code(con, lat: float, lon: float):
+    """
+    Postal code of the first WOF polygon (in table order) intersecting the
+    point, or None. The point is inlined so the R-tree index can be used.
+    """
+    row = con.execute(
+        f"""
+        SELECT postal_code
+        FROM {wof_table_name}
+        WHERE ST_Intersects(geom, ST_Point({float(lon)}, {float(lat)}))
+        ORDER BY rowid
+        LIMIT 1
+        """
+    ).fetchone()
+    return row[0] if row else None
+
+
+class DuckDBSpatialJoinEnricher:
+    """
+    Enriches a whole batch with set-based spatial joins inside DuckDB, so
+    the join runs on DuckDB's thread pool instead of per point in Python.
+
+    One ADM2 containment join resolves all three admin levels through the
+    hierarchy table; the ADM0 and ADM1 layers are joined only for the rows
+    with no ADM2 match or no parents there, with county left as the
+    hierarchy gave it.
+
+    Expects the GADM tables (load_gadm_tables), the hierarchy table
+    (load_admin_hierarchy) and the WOF table (load_wof_table) to already
+    exist on the connection.
+    """
+
+    def __init__(
+        self,
+        con,
+        country_code_mapping: dict,
+        table_names: dict = gadm_table_names,
+        hierarchy_table: str = gadm_hierarchy_table,
+    ):
+        self.con = con
+        self.country_code_mapping = country_code_mapping
+        self.table_names = table_names
+        self.hierarchy_table = hierarchy_table
+
+    def resolve(self, batch_df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Returns the input rows, in order, with country, state, county and
+        postal_code columns attached (null where a level did not match).
+        """
+        batch = batch_df.with_row_index("_row")
+        points = batch.select(
+            "_row",
+            pl.col("lon").cast(pl.Float64).alias("x"),
+            pl.col("lat").cast(pl.Float64).alias("y"),
+        )
+
+        self.con.register("batch_points", points.to_arrow())
+        try:
+            adm2_join = containment_join_sql(self.table_names["ADM2"], "t.rowid", "adm2")
+            fallback_joins = ",".join(
+                [
+                    containment_join_sql(self.table_names["ADM0"], "t.shapeGroup", "adm0", points="gaps"),
+                    containment_join_sql(self.table_names["ADM1"], "t.shapeName", "adm1", points="gaps"),
+                    containment_join_sql(
+                        wof_table_name, "t.postal_code", "postal", predicate="ST_Intersects"
+                    ),
+                ]
+            )
+            resolved = self.con.execute(
+                f"""
+                WITH pts AS (
+                    SELECT _row, x, y, ST_Point(x, y) AS pt
+                    FROM batch_points
+                    WHERE x IS NOT NULL AND y IS NOT NULL
+                ),
+                {adm2_join},
+                regions AS (
+                    SELECT
+                        pts.*,
+                        h.country,
+                        h.state,
+                        h.county,
+                        h.country IS NULL OR h.state IS NULL AS gap
+                    FROM pts
+                    LEFT JOIN adm2 USING (_row)
+                    LEFT JOIN {self.hierarchy_table} h ON h.adm2_id = adm2.value
+                ),
+                gaps AS (
+                    SELECT _row, x, y, pt FROM regions WHERE gap
+                ),
+                {fallback_joins}
+                SELECT
+                    regions._row,
+                    CASE WHEN regions.gap THEN NULL ELSE regions.country END AS country,
+                    adm0.value AS country_iso3,
+                    CASE WHEN regions.gap THEN adm1.value ELSE regions.state END AS state,
+                    regions.county,
+                    postal.value AS postal_code
+                FROM regions
+                LEFT JOIN adm0 USING (_row)
+                LEFT JOIN adm1 USING (_row)
+                LEFT JOIN postal USING (_row)
+                """
+            ).pl()
+        finally:
+            self.con.unregister("batch_points")
+
+        # The hierarchy already holds ISO2 codes; only ADM0 fallbacks need mapping
+        resolved = resolved.with_columns(
+            pl.col("_row").cast(pl.UInt32),
+            pl.coalesce(
+                pl.col("country"), pl.col("country_iso3").replace(self.country_code_mapping)
+            ).alias("country"),
+        ).drop("country_iso3")
+        logging.info(f"🧮 Spatial join resolved {len(resolved)} of {len(batch)} rows")
+
+        return (
+            batch.drop([c for c in ("country", "state", "county", "postal_code") if c in batch.columns])
+            .join(resolved, on="_row", how="left")
+            .sort("_row")
+            .drop("_row")
+        )
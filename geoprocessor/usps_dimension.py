@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+import polars as pl
+
+# How often the in-memory copy is reloaded from Postgres
+USPS_REFRESH_SECONDS = 6 * 60 * 60
+
+# One row per postal code; the lowest id wins when the CSV load produced duplicates
+USPS_DIMENSION_SQL = """
+    SELECT DISTINCT ON (postal_code) postal_code, city, locale_name
+    FROM usps_postal_code_mapping
+    WHERE postal_code IS NOT NULL
+    ORDER BY postal_code, id
+"""
+
+
+class UspsPostalDimension:
+    """
+    In-memory postal_code -> (city, locale_name) copy of usps_postal_code_mapping.
+
+    The table is small (~44k rows), so it is read once and answered from a
+    dict, or joined onto whole batches, instead of one Postgres query per
+    event. It is reloaded every refresh_seconds; a failed reload keeps
+    serving the previous copy.
+    """
+
+    def __init__(self, pg_conn, refresh_seconds: int = USPS_REFRESH_SECONDS):
+        """pg_conn: PostgresConnection provider, asked for a live connection on each load."""
+        self.pg_conn = pg_conn
+        self.refresh_seconds = refresh_seconds
+        self.frame = pl.DataFrame(
+            schema={"postal_code": pl.Utf8, "city": pl.Utf8, "usps_locale_name": pl.Utf8}
+        )
+        self.by_code = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Reads the deduplicated mapping and swaps it in."""
+        with self.pg_conn.get_conn().cursor() as cur:
+            cur.execute(USPS_DIMENSION_SQL)
+            rows = cur.fetchall()
+
+        frame = pl.DataFrame(
+            rows,
+            schema={"postal_code": pl.Utf8, "city": pl.Utf8, "usps_locale_name": pl.Utf8},
+            orient="row",
+        )
+        by_code = {code: (city, locale) for code, city, locale in rows}
+
+        # Swap references together so readers see either the old or the new copy
+        self.frame, self.by_code = frame, by_code
+        self.loaded_at = time.monotonic()
+        logging.info(f"📮 USPS postal dimension loaded: {len(by_code)} postal codes")
+
+    def refresh_if_stale(self):
+        """Reloads when older than refresh_seconds; only one caller reloads at a time."""
+        if time.monotonic() - self.loaded_at < self.refresh_seconds:
+            return
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.load()
+        except Exception:
+            logging.exception("❌ USPS postal dimension refresh failed, keeping previous copy")
+            self.loaded_at = time.monotonic()
+        finally:
+            self.lock.release()
+
+    def __len__(self):
+        return len(self.by_code)
+
+    def lookup(self, postal_code):
+        """Returns (city, locale_name) for a postal code, (None, None) when unknown."""
+        self.refresh_if_stale()
+        return self.by_code.get(postal_code, (None, None))
+
+    def attach(self, df: pl.DataFrame, columns=("city", "usps_locale_name")) -> pl.DataFrame:
+        """Joins the chosen dimension columns onto a frame by postal_code."""
+        self.refresh_if_stale()
+        columns = list(columns)
+        return df.drop(columns, strict=False).join(
+            self.frame.select("postal_code", *columns),
+            on="postal_code",
+            how="left",
+            maintain_order="left",
+        )
@@ -0,0 +1,120 @@
+import logging
+import os
+import polars as pl
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import shapely
+from deltalake import DeltaTable
+from geoprocessor.reference_watcher import built_from_current_delta
+
+# Bump when the artifact layout changes; readers refuse other versions
+WOF_ARTIFACT_VERSION = "3"
+
+
+def prepare_wof_frame(wof_df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Replaces wkt_geometry with wkb_geometry and adds minx/miny/maxx/maxy
+    bounds columns, so geometries are parsed from WKT once. The bounds are
+    the range-join pre-filter of the DuckDB WOF table (load_wof_table); the
+    per-shard STRtrees prune by bounding box on their own. Frames that
+    already carry WKB are returned unchanged.
+    """
+    if "wkb_geometry" in wof_df.columns:
+        return wof_df
+
+    geometries = shapely.from_wkt(wof_df["wkt_geometry"].to_numpy())
+    bounds = shapely.bounds(geometries)
+    return wof_df.drop("wkt_geometry").with_columns(
+        pl.Series("wkb_geometry", shapely.to_wkb(geometries), dtype=pl.Binary),
+        pl.Series("minx", bounds[:, 0]),
+        pl.Series("miny", bounds[:, 1]),
+        pl.Series("maxx", bounds[:, 2]),
+        pl.Series("maxy", bounds[:, 3]),
+    )
+
+
+def load_wof_frame(wof_delta_path: str) -> pl.DataFrame:
+    """Collects the WOF Delta table and prepares its WKB and bounds columns."""
+    wof_df = prepare_wof_frame(pl.scan_delta(wof_delta_path).collect())
+    logging.info(f"📊 WOF rows loaded: {len(wof_df)}")
+    return wof_df
+
+
+def build_wof_artifact(wof_delta_path: str, out_path: str):
+    """
+    Writes the WOF Delta table as an uncompressed Arrow IPC file that can be
+    memory-mapped: attribute columns, WKB geometry and minx/miny/maxx/maxy
+    bounds. Geometries are parsed from WKT once here instead of at runtime.
+    """
+    delta_version = DeltaTable(wof_delta_path).version()
+    artifact_df = load_wof_frame(wof_delta_path)
+    logging.info(f"📦 Building WOF artifact from Delta version {delta_version}")
+
+    table = artifact_df.to_arrow()
+    table = table.replace_schema_metadata(
+        {
+            "artifact_version": WOF_ARTIFACT_VERSION,
+            "source_delta_path": wof_delta_path,
+            "source_delta_version": str(delta_version),
+        }
+    )
+    with pa.OSFile(out_path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    logging.info(f"💾 WOF artifact v{WOF_ARTIFACT_VERSION} written to {out_path}")
+
+
+def read_wof_artifact_metadata(path: str) -> dict:
+    """Schema metadata of an artifact, without reading any data."""
+    with pa.memory_map(path, "r") as source:
+        metadata = ipc.open_file(source).schema.metadata or {}
+    return {k.decode(): v.decode() for k, v in metadata.items()}
+
+
+def wof_artifact_is_current(path: str, wof_delta_path: str) -> bool:
+    """
+    True when the artifact at path has this layout version and was built
+    from the WOF Delta table's current version. A missing, outdated or
+    stale artifact is logged and refused, so callers read Delta instead.
+    When the Delta version cannot be read, the artifact is trusted.
+    """
+    if not path or not os.path.exists(path):
+        return False
+
+    metadata = read_wof_artifact_metadata(path)
+    version = metadata.get("artifact_version")
+    if version != WOF_ARTIFACT_VERSION:
+        logging.warning(
+            f"⚠️ WOF artifact {path} has version {version}, expected {WOF_ARTIFACT_VERSION} — reading Delta"
+        )
+        return False
+
+    return built_from_current_delta(
+        "WOF artifact", path, metadata.get("source_delta_version"), wof_delta_path
+    )
+
+
+def open_wof_artifact(path: str) -> pa.Table:
+    """
+    Opens a WOF artifact with mmap as a pyarrow Table. Its buffers stay
+    backed by the file, so replicas on one host share the page cache;
+    converting the whole table to Polars would copy every column into
+    private memory, so shards are sliced from it with artifact_shard_loader.
+    """
+    source = pa.memory_map(path, "r")
+    reader = ipc.open_file(source)
+
+    metadata = {k.decode(): v.decode() for k, v in (reader.schema.metadata or {}).items()}
+    version = metadata.get("artifact_version")
+    if version != WOF_ARTIFACT_VERSION:
+        raise ValueError(
+            f"WOF artifact {path} has version {version}, expected {WOF_ARTIFACT_VERSION}"
+        )
+
+    table = reader.read_all()
+    logging.info(
+        f"🗺️ WOF artifact mapped from {path}: {table.num_rows} rows "
+        f"(Delta version {metadata.get('source_delta_version')})"
+    )
+    return table
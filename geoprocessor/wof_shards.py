@@ -0,0 +1,132 @@
+import logging
+import threading
+from collections import OrderedDict
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import shapely
+from geoprocessor.postal_index import PostalPolygonIndex
+from geoprocessor.wof_artifact import prepare_wof_frame
+
+# Rough in-memory cost of one parsed coordinate (two doubles) plus per-geometry overhead
+COORD_BYTES = 16
+GEOMETRY_OVERHEAD_BYTES = 128
+
+
+class WofShard:
+    """
+    One (country, state) slice of the WOF table with its postal index. Built
+    once and never mutated, so it can be shared by every lookup of the state.
+    """
+
+    def __init__(self, country: str, state: str, frame: pl.DataFrame):
+        self.country = country
+        self.state = state
+        self.frame = frame
+        self.index = PostalPolygonIndex.from_frame(frame) if not frame.is_empty() else None
+
+        self.size_bytes = frame.estimated_size()
+        if self.index is not None:
+            coords = sum(
+                shapely.get_num_coordinates(g).sum()
+                for g in (self.index.geometries, self.index.inner, self.index.outer)
+            )
+            self.size_bytes += int(
+                coords * COORD_BYTES + 3 * len(self.index) * GEOMETRY_OVERHEAD_BYTES
+            )
+
+    def match(self, lat: float, lon: float):
+        """Returns the WOF row whose polygon contains the point as a one-row frame, or None."""
+        if self.index is None:
+            return None
+
+        position = self.index.locate(lat, lon)
+        if position is None:
+            return None
+
+        return self.frame.slice(position, 1)
+
+
+def delta_shard_loader(wof_delta_path: str):
+    """
+    Loader reading one (country, state) from the WOF Delta table. The filter
+    is pushed into scan_delta, so only that partition's files are read.
+    """
+
+    def load(country: str, state: str) -> pl.DataFrame:
+        return prepare_wof_frame(
+            pl.scan_delta(wof_delta_path)
+            .filter((pl.col("country") == country) & (pl.col("state") == state))
+            .collect()
+        )
+
+    return load
+
+
+def artifact_shard_loader(table: pa.Table):
+    """
+    Loader slicing a memory-mapped WOF artifact (open_wof_artifact). The
+    filter runs in pyarrow over the mapped buffers, so only the shard's rows
+    are copied into Polars and counted against the shard budget; the rest of
+    the artifact stays in the shared page cache.
+    """
+
+    def load(country: str, state: str) -> pl.DataFrame:
+        mask = pc.and_(pc.equal(table["country"], country), pc.equal(table["state"], state))
+        return pl.from_arrow(table.filter(mask))
+
+    return load
+
+
+class WofShardStore:
+    """
+    WOF shards loaded on demand per (country, state) and evicted LRU once
+    their estimated size exceeds max_bytes. The most recently used shard is
+    always kept, even if it alone is over budget. Safe to share between
+    threads; a shard is loaded at most once even when requested concurrently.
+    """
+
+    def __init__(self, loader, max_bytes: int = 512 * 1024 * 1024):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.shards = OrderedDict()  # (country, state) -> WofShard
+        self.current_bytes = 0
+        self.loads = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, country: str, state: str) -> WofShard:
+        with self.lock:
+            return self._get(country, state)
+
+    def _get(self, country: str, state: str) -> WofShard:
+        key = (country, state)
+        shard = self.shards.get(key)
+        if shard is not None:
+            self.shards.move_to_end(key)
+            return shard
+
+        logging.info(f"📂 Loading WOF shard {country}/{state}")
+        shard = WofShard(country, state, self.loader(country, state))
+        self.loads += 1
+        logging.info(f"📊 WOF shard {country}/{state}: {len(shard.frame)} rows, ~{shard.size_bytes} bytes")
+
+        self.shards[key] = shard
+        self.current_bytes += shard.size_bytes
+        while self.current_bytes > self.max_bytes and len(self.shards) > 1:
+            evicted_key, evicted = self.shards.popitem(last=False)
+            self.current_bytes -= evicted.size_bytes
+            self.evictions += 1
+            logging.info(f"🧹 Evicted WOF shard {evicted_key[0]}/{evicted_key[1]}")
+
+        return shard
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "shards": len(self.shards),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
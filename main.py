@@ -1,24 +1,45 @@
 import os
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import polars as pl
 from datetime import datetime
 from reader.log_reader import LogReader
 from storage.delta_writer import DeltaWriter
 from storage.postgres_writer import PostgresWriter
 from geoprocessor.search_locations import WeatherDataLocationSearcher
+from geoprocessor.usps_dimension import UspsPostalDimension
+from utils.postgres_connection import PostgresConnection
 import logging
 
 LOG_FILE = "/home/dev/mqtt-python/mqtt_weather_logs.log"
 PROCESSED_SENSOR_DATA_DELTA_PATH = "/datasnake-deltalake-sensor-data-processed"
 WOF_DELTA_PATH = "/home/resources/deltalake-wof-oregon"
 BATCH_SIZE = 5000
+# How each batch is geocoded:
+#   "vectorized"   - one lookup_batch on the GEOCODING_BACKEND engine (default)
+#   "threaded"     - vectorized micro-batches overlapped on a thread pool
+#   "spatial_join" - set-based spatial joins inside DuckDB (ADM2 + hierarchy, WOF)
+#   "row"          - the original row-by-row lookups
+ENRICHMENT_MODE = os.getenv("ENRICHMENT_MODE", "vectorized")
+# Worker processes enriching batches in parallel; 1 keeps everything in this process
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "1"))
 
+# Searcher owned by a pool worker, built once by init_enrichment_worker
+worker_searcher = None
 
-def process_batch(batch_df, searcher, delta_writer, postgres_writer, start, end):
-    logging.info(f"🚀 Processing batch rows {start} to {end}")
 
-    # Enrich
+def enrich_batch(batch_df, searcher):
     t1 = datetime.now()
-    enriched_df = searcher.enrich_weather_data_optimized(batch_df)
+    if ENRICHMENT_MODE == "spatial_join":
+        enriched_df = searcher.enrich_weather_data_spatial_join(batch_df)
+    elif ENRICHMENT_MODE == "threaded":
+        enriched_df = searcher.enrich_weather_data_threaded(batch_df)
+    elif ENRICHMENT_MODE == "row":
+        enriched_df = searcher.enrich_weather_data_optimized(batch_df)
+    else:
+        enriched_df = searcher.enrich_weather_data_vectorized(batch_df)
     enriched_df = enriched_df.with_columns(
         pl.col("city").cast(pl.Utf8).fill_null("Unknown"),
         pl.col("state").cast(pl.Utf8).fill_null("Unknown"),
@@ -27,7 +48,27 @@ def process_batch(batch_df, searcher, delta_writer, postgres_writer, start, end)
     )
     t2 = datetime.now()
     logging.info(f"🗺️  Enrichment time: {t2 - t1}")
+    return enriched_df
+
+
+def build_searcher(database_uri):
+    usps_dimension = UspsPostalDimension(PostgresConnection(database_uri))
+    return WeatherDataLocationSearcher(WOF_DELTA_PATH, usps_dimension=usps_dimension)
+
+
+def init_enrichment_worker(database_uri):
+    """Pool initializer: each worker loads the geo indexes once and reuses them."""
+    global worker_searcher
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f"👷 Enrichment worker {os.getpid()} loading geo indexes")
+    worker_searcher = build_searcher(database_uri)
+
+
+def enrich_batch_in_worker(batch_df):
+    return enrich_batch(batch_df, worker_searcher)
 
+
+def write_batch(enriched_df, delta_writer, postgres_writer):
     # Delta write (optional)
     t1 = datetime.now()
     # delta_writer.write_to_deltalake(enriched_df)
@@ -41,21 +82,67 @@ def process_batch(batch_df, searcher, delta_writer, postgres_writer, start, end)
     logging.info(f"⚡ Postgres write time: {t2 - t1}")
 
 
-def main():
-    logging.info("📥 Reading weather data log...")
-    weather_data_df = LogReader.read_log_file(LOG_FILE, return_as_dataframe=True)
-    logging.info(weather_data_df.head())
-    logging.info(f"📈 Total rows to process: {len(weather_data_df)}")
+def process_batch(batch_df, searcher, delta_writer, postgres_writer, start, end):
+    logging.info(f"🚀 Processing batch rows {start} to {end}")
+    enriched_df = enrich_batch(batch_df, searcher)
+    write_batch(enriched_df, delta_writer, postgres_writer)
+
+
+def iter_batches(log_file):
+    """
+    (start, end, batch_df) for each BATCH_SIZE-row chunk, streamed as the
+    log is read so only the batches in flight are held in memory.
+    """
+    start = 0
+    for batch_df in LogReader.iter_log_chunks(log_file, chunk_rows=BATCH_SIZE):
+        end = start + len(batch_df)
+        yield start, end, batch_df
+        start = end
+
+
+def process_batches_in_pool(batches, delta_writer, postgres_writer, workers, database_uri):
+    """
+    Enriches batches across a process pool and writes them here, in batch
+    order. Workers are spawned rather than forked so each opens its own
+    DuckDB connection; at most two batches per worker are in flight.
+    """
+    pending = deque()
+
+    def write_oldest():
+        start, end, future = pending.popleft()
+        enriched_df = future.result()
+        logging.info(f"🚀 Writing batch rows {start} to {end}")
+        write_batch(enriched_df, delta_writer, postgres_writer)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_enrichment_worker,
+        initargs=(database_uri,),
+    ) as executor:
+        for start, end, batch_df in batches:
+            pending.append((start, end, executor.submit(enrich_batch_in_worker, batch_df)))
+            if len(pending) >= workers * 2:
+                write_oldest()
+
+        while pending:
+            write_oldest()
 
-    if len(weather_data_df) == 0:
+
+def main():
+    logging.info("📥 Streaming weather data log...")
+    batches = iter_batches(LOG_FILE)
+    first_batch = next(batches, None)
+    if first_batch is None:
         logging.warning("No data to process. Exiting.")
         return
+    logging.info(first_batch[2].head())
+    batches = itertools.chain([first_batch], batches)
 
     database_uri = os.getenv("DATABASE_URI")
     if not database_uri:
         raise RuntimeError("DATABASE_URI environment variable is not set")
 
-    searcher = WeatherDataLocationSearcher(WOF_DELTA_PATH)
     delta_writer = DeltaWriter()
 
     postgres_writer = PostgresWriter(
@@ -63,11 +150,17 @@ def main():
         table="sensor_data_processed",
     )
 
-    total_rows = len(weather_data_df)
+    if ENRICHMENT_WORKERS > 1:
+        logging.info(f"🧵 Enriching with {ENRICHMENT_WORKERS} worker processes")
+        process_batches_in_pool(
+            batches, delta_writer, postgres_writer, ENRICHMENT_WORKERS, database_uri
+        )
+        logging.info("✅ All batches processed successfully.")
+        return
+
+    searcher = build_searcher(database_uri)
 
-    for start in range(0, total_rows, BATCH_SIZE):
-        end = min(start + BATCH_SIZE, total_rows)
-        batch_df = weather_data_df.slice(start, end - start)
+    for start, end, batch_df in batches:
         process_batch(batch_df, searcher, delta_writer, postgres_writer, start, end)
 
     logging.info("✅ All batches processed successfully.")
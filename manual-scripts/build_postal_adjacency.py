@@ -0,0 +1,40 @@
+import argparse
+import logging
+
+import polars as pl
+from deltalake import DeltaTable
+
+from geoprocessor.postal_adjacency import NEARBY_K, PostalAdjacency
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute postal code -> nearby postal codes from WOF polygons"
+    )
+    parser.add_argument(
+        "--wof", default="/home/resources/deltalake-wof-oregon", help="WOF Delta table path"
+    )
+    parser.add_argument(
+        "--out",
+        default="/home/resources/wof-oregon-postal-adjacency.parquet",
+        help="Output .parquet table path",
+    )
+    parser.add_argument(
+        "--k", type=int, default=NEARBY_K, help="Nearest codes by centroid, on top of touching ones"
+    )
+    args = parser.parse_args()
+
+    # Pinned, so the recorded version is the one the table is built from
+    delta_version = DeltaTable(args.wof).version()
+    wof_df = pl.scan_delta(args.wof, version=delta_version).select("postal_code", "wkt_geometry").collect()
+    logging.info(f"📊 WOF rows loaded: {len(wof_df)} (Delta version {delta_version})")
+
+    adjacency = PostalAdjacency.build(wof_df, k=args.k, source_delta_version=str(delta_version))
+    adjacency.save(args.out)
+    logging.info(f"💾 Postal adjacency written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import logging
+
+import polars as pl
+from deltalake import DeltaTable
+
+from geoprocessor.postal_grid import PostalGrid
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rasterize WOF postal polygons into a grid-cell -> postal code lookup"
+    )
+    parser.add_argument(
+        "--wof", default="/home/resources/deltalake-wof-oregon", help="WOF Delta table path"
+    )
+    parser.add_argument(
+        "--out",
+        default="/home/resources/wof-oregon-postal-grid.npz",
+        help="Output .npz grid path",
+    )
+    parser.add_argument(
+        "--cell-size", type=float, default=0.005, help="Cell size in degrees"
+    )
+    args = parser.parse_args()
+
+    # Pinned, so the recorded version is the one rasterized
+    delta_version = DeltaTable(args.wof).version()
+    wof_df = pl.scan_delta(args.wof, version=delta_version).select("postal_code", "wkt_geometry").collect()
+    logging.info(f"📊 WOF rows loaded: {len(wof_df)} (Delta version {delta_version})")
+
+    grid = PostalGrid.build(wof_df, cell_size_deg=args.cell_size, source_delta_version=str(delta_version))
+    grid.save(args.out)
+    logging.info(f"💾 Postal grid written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import argparse
+import logging
+
+from geoprocessor.wof_artifact import build_wof_artifact
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the memory-mappable WOF index artifact (Arrow IPC) from the WOF Delta table"
+    )
+    parser.add_argument(
+        "--wof", default="/home/resources/deltalake-wof-oregon", help="WOF Delta table path"
+    )
+    parser.add_argument(
+        "--out", default="/home/resources/wof-oregon.arrow", help="Output artifact path"
+    )
+    args = parser.parse_args()
+
+    build_wof_artifact(args.wof, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -120,7 +120,7 @@ class RawPostgresWriter:
                     row.get("state"),
                     row.get("country"),
                     row.get("postal_code"),
-                    None,  # nearby_postal_codes (defer)
+                    row.get("nearby_postal_codes"),
                     datetime.utcnow(),  # processed_at
                 )
             )
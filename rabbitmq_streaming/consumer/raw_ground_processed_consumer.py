@@ -7,6 +7,7 @@ from datetime import datetime
 from pathlib import Path
 import polars as pl
 from geoprocessor.call_search_locations import WeatherDataLocationSearcher
+from geoprocessor.device_location_memo import DeviceLocationMemo
 from .raw_ground_postgres_writer import RawPostgresWriter
 from utils.postgres_connection import PostgresConnection
 
@@ -33,10 +34,26 @@ QUEUE = "sensor_ground_raw_processed"
 # Processing config
 # -----------------------------
 WOF_DELTA_PATH = "/home/resources/deltalake-wof-oregon"
+# Built offline by manual-scripts/build_postal_grid.py; skipped if missing or stale
+POSTAL_GRID_PATH = "/home/resources/wof-oregon-postal-grid.npz"
+# Built offline by manual-scripts/build_postal_adjacency.py; skipped if missing or stale
+POSTAL_ADJACENCY_PATH = "/home/resources/wof-oregon-postal-adjacency.parquet"
+# Coastal/border points outside every postal polygon take the nearest one within this range
+NEAREST_POSTAL_MAX_DISTANCE_M = 1000.0
+# Point-in-polygon backend: "grid", "strtree" or "duckdb"
+GEOCODING_BACKEND = os.getenv("GEOCODING_BACKEND", "grid")
+# New WOF Delta versions / GADM, grid or artifact files are picked up this often; 0 disables
+REFERENCE_POLL_SECONDS = float(os.getenv("REFERENCE_POLL_SECONDS", "300"))
+# Built offline by manual-scripts/build_wof_artifact.py; falls back to Delta if missing or stale
+WOF_ARTIFACT_PATH = "/home/resources/wof-oregon.arrow"
 
 OUTPUT_LOG = Path("/home/dev/mqtt-python/processed_sensor_events.log")
 OUTPUT_LOG.parent.mkdir(parents=True, exist_ok=True)
 
+# Fixed devices reuse their last enrichment while they stay within this distance
+DEVICE_MEMO_PATH = Path("/home/dev/mqtt-python/device_locations.sqlite")
+DEVICE_MEMO_MAX_DISTANCE_M = 50.0
+
 MESSAGE_RE = re.compile(r"message:\s*(\{.*\})\s*\|")
 
 gadm_paths = {
@@ -148,7 +165,22 @@ def main():
     global searcher
     global postgres_writer
     pg_conn = PostgresConnection(POSTGRES_DSN)
-    searcher = WeatherDataLocationSearcher(WOF_DELTA_PATH, gadm_paths=gadm_paths, pg_conn=pg_conn)
+    device_memo = DeviceLocationMemo(
+        str(DEVICE_MEMO_PATH), max_distance_m=DEVICE_MEMO_MAX_DISTANCE_M
+    )
+    searcher = WeatherDataLocationSearcher(
+        WOF_DELTA_PATH,
+        gadm_paths=gadm_paths,
+        pg_conn=pg_conn,
+        device_memo=device_memo,
+        postal_grid_path=POSTAL_GRID_PATH,
+        wof_artifact_path=WOF_ARTIFACT_PATH,
+        postal_adjacency_path=POSTAL_ADJACENCY_PATH,
+        nearest_postal_max_distance_m=NEAREST_POSTAL_MAX_DISTANCE_M,
+        geocoding_backend=GEOCODING_BACKEND,
+    )
+    if REFERENCE_POLL_SECONDS > 0:
+        searcher.start_reference_watcher(REFERENCE_POLL_SECONDS)
     postgres_writer = RawPostgresWriter(POSTGRES_DSN)
 
     connection = connect_rabbitmq()
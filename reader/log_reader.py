@@ -9,6 +9,21 @@ try:
 except ImportError:
     USE_WEATHER_MODEL = False
 
+# Starting dtypes of WeatherData.to_dict() columns when streaming chunks; a
+# chunk can only widen them (e.g. sats to Float64), never narrow them
+WEATHER_DATA_SCHEMA = {
+    "device_id": pl.Utf8,
+    "temp": pl.Float64,
+    "humidity": pl.Float64,
+    "pressure": pl.Float64,
+    "lat": pl.Float64,
+    "lon": pl.Float64,
+    "alt": pl.Float64,
+    "sats": pl.Int64,
+    "wind_speed": pl.Float64,
+    "wind_direction": pl.Float64,
+}
+
 class LogReader:
     LOG_PATTERN = re.compile(
         r"(?:\[(.*?)\])?\s*topic:\s*weather/data\s*\|\s*message:\s*(\{.*?\})"
@@ -17,10 +32,8 @@ class LogReader:
     )
 
     @staticmethod
-    def read_log_file(filepath, return_as_dataframe=False):
-        """Reads a log file and returns extracted weather data as a list or Polars DataFrame."""
-        weather_data_list = []
-
+    def iter_records(filepath):
+        """Yields one WeatherData (or dict, without the model) per matching log line."""
         with Path(filepath).open("r") as file:
             for line in file:
                 match = LogReader.LOG_PATTERN.search(line)
@@ -30,16 +43,53 @@ class LogReader:
                     # print(json_str)
 
                     if USE_WEATHER_MODEL:
-                        weather_data = WeatherData.from_json(json_str, timestamp)
+                        yield WeatherData.from_json(json_str, timestamp)
                     else:
                         data = json.loads(json_str)
                         data["timestamp"] = timestamp
-                        weather_data = data
+                        yield data
 
-                    weather_data_list.append(weather_data)
+    @staticmethod
+    def read_log_file(filepath, return_as_dataframe=False):
+        """Reads a log file and returns extracted weather data as a list or Polars DataFrame."""
+        weather_data_list = list(LogReader.iter_records(filepath))
 
         if return_as_dataframe:
             df = pl.DataFrame([data.to_dict() if USE_WEATHER_MODEL else data for data in weather_data_list])
             return df
 
         return weather_data_list
+
+    @staticmethod
+    def iter_log_chunks(filepath, chunk_rows=5000):
+        """
+        Reads a log file as a stream of Polars DataFrames of up to chunk_rows
+        rows, so only one chunk is held in memory at a time. Each column is
+        cast to the supertype of its dtype in every chunk read so far (starting
+        from WEATHER_DATA_SCHEMA with the model), so values are only ever
+        widened: an integer column that later sees 2.7 becomes Float64.
+        """
+        schema = dict(WEATHER_DATA_SCHEMA) if USE_WEATHER_MODEL else {}
+        rows = []
+        for weather_data in LogReader.iter_records(filepath):
+            rows.append(weather_data.to_dict() if USE_WEATHER_MODEL else weather_data)
+            if len(rows) >= chunk_rows:
+                yield LogReader.chunk_frame(rows, schema)
+                rows = []
+        if rows:
+            yield LogReader.chunk_frame(rows, schema)
+
+    @staticmethod
+    def chunk_frame(rows, schema):
+        """DataFrame of one chunk widened to, and widening, the running schema."""
+        df = pl.DataFrame(rows, infer_schema_length=None)
+        # Supertype per column, as a relaxed concatenation would pick it
+        widened = pl.concat(
+            [pl.DataFrame(schema=schema), df.clear()], how="diagonal_relaxed"
+        ).schema
+        schema.update(widened)
+        return df.with_columns(
+            pl.col(name).cast(widened[name])
+            for name, dtype in df.schema.items()
+            if dtype != widened[name]
+        )
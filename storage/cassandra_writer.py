@@ -69,7 +69,7 @@ class CassandraWriter:
                         row.get("state", "unknown"),
                         row.get("country", "unknown"),
                         row.get("postal_code", "00000"),
-                        ["00001", "00002"],  # Dummy list of nearby postal codes
+                        row.get("nearby_postal_codes") or [],
                         datetime.utcnow(),  # Processed timestamp
                     )
                 )
@@ -114,7 +114,7 @@ class CassandraWriter:
                         row.get("state", "unknown"),
                         row.get("country", "unknown"),
                         row.get("postal_code", "00000"),
-                        ["00001", "00002"],  # Dummy list of nearby postal codes
+                        row.get("nearby_postal_codes") or [],
                         datetime.utcnow(),  # Processed timestamp
                     )
                 )
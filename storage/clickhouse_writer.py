@@ -85,10 +85,7 @@ class ClickHouseWriter:
                         "state": row.get("state") or "unknown",
                         "country": row.get("country") or "unknown",
                         "postal_code": row.get("postal_code") or "00000",
-                        "nearby_postal_codes": [
-                            "00001",
-                            "00002",
-                        ],  # Make sure your schema supports Array(String)
+                        "nearby_postal_codes": row.get("nearby_postal_codes") or [],
                         "processed_at": row.get("timestamp") or datetime.utcnow(),
                     }
                 )
@@ -156,7 +153,7 @@ class ClickHouseWriter:
                         row.get("state") or "unknown",
                         row.get("country") or "unknown",
                         row.get("postal_code") or "00000",
-                        ["00001", "00002"],  # Array(String)
+                        row.get("nearby_postal_codes") or [],  # Array(String)
                         (
                             parse_date(row.get("timestamp"))
                             if isinstance(row.get("timestamp"), str)
@@ -140,12 +140,13 @@ class PostgresWriter:
                     row.get("sats") or 0,
                     row.get("wind_speed") or 0.0,
                     row.get("wind_direction") or 0.0,
+                    row.get("usps_locale_name"),
                     "dummy_county",
                     row.get("city") or "unknown",
                     row.get("state") or "unknown",
                     row.get("country") or "unknown",
                     row.get("postal_code") or "00000",
-                    ["00001", "00002"],
+                    row.get("nearby_postal_codes"),
                     processed_ts,
                 )
             )
@@ -165,6 +166,7 @@ class PostgresWriter:
                 sats,
                 wind_speed,
                 wind_direction,
+                usps_locale_name,
                 county,
                 city,
                 state,
@@ -175,7 +177,8 @@ class PostgresWriter:
             )
             VALUES (
                 %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                %s
             )
         """
 
@@ -240,7 +243,7 @@ class PostgresWriter:
                     row.get("state"),
                     row.get("country"),
                     row.get("postal_code"),
-                    None,  # nearby_postal_codes (defer)
+                    row.get("nearby_postal_codes"),
                     datetime.utcnow(),  # processed_at
                 )
             )
@@ -0,0 +1,251 @@
+"""
+Offline geocoding benchmark on synthetic Oregon points.
+
+Runs uniform and clustered workloads through every searcher path against
+local GADM GeoPackages and the WOF Delta table, and prints one JSON report:
+
+    PYTHONPATH=. python tests/geocoding_performance/benchmark_geocoding.py --points 20000
+
+peak_rss_mb is the process high-water mark after each path, so paths that
+run later include the memory held by earlier ones.
+"""
+
+import argparse
+import json
+import logging
+import resource
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import polars as pl
+
+from geoprocessor import search_locations
+from geoprocessor.geocoding_engine import build_geocoding_engine, geocoding_backends
+
+# Oregon bounding box, same as manual-scripts/generate_iot_sensor_data_distributed.py
+LAT_RANGE = (42.00, 46.30)
+LON_RANGE = (-124.60, -116.50)
+
+# Clustered workload: devices gathered around a few towns
+CLUSTER_COUNT = 20
+CLUSTER_SIGMA_DEG = 0.02
+
+# Fewer timed calls than this give no meaningful p99, so none is reported
+MIN_PERCENTILE_CALLS = 100
+
+
+def generate_points(workload: str, n_points: int, seed: int) -> pl.DataFrame:
+    """Sensor-shaped frame with uniform or clustered lat/lon inside the Oregon bbox."""
+    rng = np.random.default_rng(seed)
+
+    if workload == "uniform":
+        lats = rng.uniform(*LAT_RANGE, n_points)
+        lons = rng.uniform(*LON_RANGE, n_points)
+        devices = rng.integers(0, CLUSTER_COUNT, n_points)
+    else:
+        center_lats = rng.uniform(*LAT_RANGE, CLUSTER_COUNT)
+        center_lons = rng.uniform(*LON_RANGE, CLUSTER_COUNT)
+        devices = rng.integers(0, CLUSTER_COUNT, n_points)
+        lats = np.clip(center_lats[devices] + rng.normal(0, CLUSTER_SIGMA_DEG, n_points), *LAT_RANGE)
+        lons = np.clip(center_lons[devices] + rng.normal(0, CLUSTER_SIGMA_DEG, n_points), *LON_RANGE)
+
+    return pl.DataFrame(
+        {
+            "device_id": [f"device-{d:03d}" for d in devices],
+            "lat": lats.round(5),
+            "lon": lons.round(5),
+            "temp": rng.uniform(5, 32, n_points).round(2),
+            "humidity": rng.uniform(30, 95, n_points).round(2),
+            "pressure": rng.uniform(980, 1035, n_points).round(2),
+            "alt": rng.uniform(0, 3000, n_points).round(2),
+            "sats": rng.integers(0, 13, n_points),
+            "wind_speed": rng.uniform(0, 35, n_points).round(2),
+            "wind_direction": rng.integers(0, 361, n_points),
+            "timestamp": [datetime.utcnow().isoformat()] * n_points,
+        }
+    )
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def cache_counters(caches: dict) -> dict:
+    """(hits, misses) of each named cache."""
+    return {name: (cache.stats()["hits"], cache.stats()["misses"]) for name, cache in caches.items()}
+
+
+def run_path(name: str, fn, frames, warmup: int = 1, caches: dict = None) -> dict:
+    """
+    Times fn over each frame. latency_per_point_us is total time over
+    points, comparable between batch and per-point paths. Percentiles are
+    per call (per batch or per point) and only reported from
+    MIN_PERCENTILE_CALLS timed calls up; a p99 of a few batches is just
+    the slowest one. caches: name -> cache the path reads, for hit rates.
+    The first `warmup` calls load shards and indexes and are left out of
+    the numbers.
+    """
+    caches = caches or {}
+    latencies = []
+    matched = 0
+    points = 0
+    try:
+        for frame in frames[:warmup]:
+            fn(frame)
+
+        before = cache_counters(caches)
+        for frame in frames[warmup:]:
+            start = time.perf_counter()
+            result = fn(frame)
+            latencies.append(time.perf_counter() - start)
+            points += len(frame)
+            if isinstance(result, pl.DataFrame):
+                matched += len(result)
+            elif result is not None:
+                matched += 1
+    except Exception as e:
+        logging.exception(f"❌ {name} failed")
+        return {"path": name, "error": str(e)}
+
+    seconds = sum(latencies)
+    percentiles = len(latencies) >= MIN_PERCENTILE_CALLS
+    report = {
+        "path": name,
+        "points": points,
+        "matched": matched,
+        "seconds": round(seconds, 4),
+        "points_per_sec": round(points / seconds, 1) if seconds else None,
+        "latency_per_point_us": round(seconds / points * 1e6, 3) if points else None,
+        "timed_calls": len(latencies),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3) if percentiles else None,
+        "latency_p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3) if percentiles else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    if caches:
+        hit_rates = {}
+        for cache_name, (hits, misses) in cache_counters(caches).items():
+            hits_before, misses_before = before[cache_name]
+            lookups = (hits - hits_before) + (misses - misses_before)
+            hit_rates[cache_name] = round((hits - hits_before) / lookups, 4) if lookups else None
+        report["cache_hit_rates"] = hit_rates
+    return report
+
+
+def lookup_one_frames(df: pl.DataFrame):
+    return [df.slice(i, 1) for i in range(len(df))]
+
+
+def benchmark_workload(searcher, workload: str, args) -> list:
+    df = generate_points(workload, args.points, args.seed)
+    batches = list(df.iter_slices(args.batch_size))
+    sample = lookup_one_frames(df.head(args.sample_points))
+    results = []
+
+    for backend in sorted(geocoding_backends):
+        try:
+            engine = build_geocoding_engine(
+                backend,
+                search_locations.cursors,
+                searcher.admin_hierarchy,
+                searcher.wof_shards,
+                search_locations.country_code_mapping,
+                searcher.delta_wof_path,
+                postal_grid=searcher.postal_grid,
+                admin_indexes=searcher.admin_indexes,
+                nearest_postal_max_distance_m=search_locations.NEAREST_POSTAL_MAX_DISTANCE_M,
+                wof_artifact=searcher.wof_artifact,
+            )
+        except Exception as e:
+            logging.exception(f"❌ Could not build {backend} backend")
+            results.append({"path": f"vectorized:{backend}", "error": str(e)})
+            continue
+
+        results.append(
+            run_path(
+                f"vectorized:{engine.name}",
+                lambda frame: searcher.enrich_with_engine(frame, engine),
+                batches,
+            )
+        )
+        results.append(
+            run_path(
+                f"lookup_one:{engine.name}",
+                lambda frame: engine.lookup_one(frame["lat"][0], frame["lon"][0]),
+                sample,
+            )
+        )
+
+    results.append(run_path("threaded", searcher.enrich_weather_data_threaded, batches))
+
+    # Row path: one call per point, cold caches so the hit rates mean something.
+    # It is the only path reading geocode_cache and gadm_cache.
+    search_locations.geocode_cache.clear()
+    search_locations.gadm_cache.clear()
+    results.append(
+        run_path(
+            "row",
+            searcher.enrich_weather_data_optimized,
+            sample,
+            caches={"geocode": search_locations.geocode_cache, "gadm": search_locations.gadm_cache},
+        )
+    )
+
+    for result in results:
+        result["workload"] = workload
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline geocoding throughput benchmark")
+    parser.add_argument("--wof", default=search_locations.read_paths["WOF"], help="WOF Delta table path")
+    parser.add_argument("--adm0", default=search_locations.read_paths["ADM0"], help="GADM ADM0 .gpkg")
+    parser.add_argument("--adm1", default=search_locations.read_paths["ADM1"], help="GADM ADM1 .gpkg")
+    parser.add_argument("--adm2", default=search_locations.read_paths["ADM2"], help="GADM ADM2 .gpkg")
+    parser.add_argument("--postal-grid", default=search_locations.POSTAL_GRID_PATH, help="PostalGrid .npz, optional")
+    parser.add_argument("--wof-artifact", default=search_locations.WOF_ARTIFACT_PATH, help="WOF Arrow IPC, optional")
+    parser.add_argument("--points", type=int, default=20000, help="Points per workload")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per batch for the batch paths")
+    parser.add_argument("--sample-points", type=int, default=500, help="Points for the per-point paths")
+    parser.add_argument("--workloads", nargs="+", default=["uniform", "clustered"], choices=["uniform", "clustered"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Per-row INFO logs would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    searcher = search_locations.WeatherDataLocationSearcher(
+        args.wof,
+        postal_grid_path=args.postal_grid,
+        wof_artifact_path=args.wof_artifact,
+        gadm_paths={"ADM0": args.adm0, "ADM1": args.adm1, "ADM2": args.adm2},
+    )
+    setup_seconds = time.perf_counter() - start
+
+    results = []
+    for workload in args.workloads:
+        results.extend(benchmark_workload(searcher, workload, args))
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "setup_seconds": round(setup_seconds, 3),
+        "config": vars(args),
+        "wof_shards": searcher.wof_shards.stats(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+
+    # Non-zero exit when a path broke, so a CI step notices
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+
+import polars as pl
+import pytest
+
+from DataFrameCache import ENTRY_OVERHEAD_BYTES, DataFrameCache
+
+
+def frame(n, value=0):
+    return pl.DataFrame({"value": [value] * n}, schema={"value": pl.Int64})
+
+
+def test_max_entries_evicts_least_recently_used():
+    cache = DataFrameCache(max_entries=2, max_bytes=None)
+    cache.set("a", frame(1))
+    cache.set("b", frame(1))
+    cache.get("a")
+    cache.set("c", frame(1))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_max_bytes_evicts_least_recently_used():
+    entry_bytes = ENTRY_OVERHEAD_BYTES + frame(1000).estimated_size()
+    cache = DataFrameCache(max_entries=None, max_bytes=2 * entry_bytes)
+    cache.set("a", frame(1000))
+    cache.set("b", frame(1000))
+    cache.get("a")
+    cache.set("c", frame(1000))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["bytes"] == 2 * entry_bytes
+
+
+def test_newest_entry_is_kept_even_over_max_bytes():
+    cache = DataFrameCache(max_bytes=1)
+    cache.set("a", frame(1000))
+
+    assert cache.get("a") is not None
+
+
+def test_expired_entries_are_dropped_on_get_and_sweep():
+    cache = DataFrameCache(expiration_minutes=0)
+    cache.set("a", frame(1))
+    cache.set("b", frame(1))
+
+    assert cache.get("a") is None
+    assert cache.sweep() == 1
+    stats = cache.stats()
+    assert stats["entries"] == 0
+    assert stats["expirations"] == 2
+
+
+def test_get_or_compute_runs_fn_once_for_concurrent_misses():
+    cache = DataFrameCache()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return frame(3, value=7)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while not cache.pending:
+        time.sleep(0.001)
+    time.sleep(0.05)  # Let the other threads reach the pending future
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 5
+    assert all(result.equals(frame(3, value=7)) for result in results)
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 4
+
+
+def test_get_or_compute_raises_fn_error_in_every_waiter():
+    cache = DataFrameCache()
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise ValueError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute("key", compute)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while not cache.pending:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert not cache.pending
+    assert cache.get("key") is None
+
+
+def test_get_or_compute_does_not_cache_none():
+    cache = DataFrameCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_compute("key", compute) is None
+    assert cache.get_or_compute("key", compute) is None
+    assert len(calls) == 2
+
+
+def test_disk_tier_serves_a_restarted_cache(tmp_path):
+    cache = DataFrameCache(disk_dir=str(tmp_path))
+    cache.set(("US", "OR"), frame(10, value=1))
+
+    restarted = DataFrameCache(disk_dir=str(tmp_path))
+    assert restarted.get(("US", "OR")).equals(frame(10, value=1))
+    assert restarted.stats()["disk_hits"] == 1
+    # Promoted into memory: the next read does not touch disk
+    restarted.get(("US", "OR"))
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used_over_max_bytes(tmp_path):
+    cache = DataFrameCache(disk_dir=str(tmp_path))
+    cache.set("a", frame(1000))
+    file_bytes = cache.stats()["disk"]["bytes"]
+
+    cache = DataFrameCache(disk_dir=str(tmp_path), disk_max_bytes=2 * file_bytes)
+    cache.set("b", frame(1000))
+    cache.set("c", frame(1000))
+
+    disk = cache.stats()["disk"]
+    assert disk["files"] == 2
+    assert disk["evictions"] == 1
+    assert DataFrameCache(disk_dir=str(tmp_path)).get("a") is None
+
+
+def test_disk_tier_drops_expired_files(tmp_path):
+    cache = DataFrameCache(expiration_minutes=1, disk_dir=str(tmp_path))
+    cache.set("a", frame(1))
+    cache.set("b", frame(1))
+    old = time.time() - 120
+    for name in os.listdir(tmp_path):
+        os.utime(tmp_path / name, (old, old))
+
+    restarted = DataFrameCache(expiration_minutes=1, disk_dir=str(tmp_path))
+    assert restarted.get("a") is None
+    assert restarted.sweep() == 1
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("disk", [False, True])
+def test_invalidate_and_clear(tmp_path, disk):
+    cache = DataFrameCache(disk_dir=str(tmp_path) if disk else None)
+    cache.set("a", frame(1))
+    cache.set("b", frame(1))
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    cache.clear()
+    assert cache.get("b") is None
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,81 @@
+import sqlite3
+
+from geoprocessor.device_location_memo import DeviceLocationMemo
+
+LOCATION = {"country": "US", "state": "OR", "county": "Multnomah", "postal_code": "97201", "postal_distance_m": 12.5}
+
+
+def test_put_is_reused_nearby_and_persisted(tmp_path):
+    store_path = str(tmp_path / "memo.sqlite")
+    memo = DeviceLocationMemo(store_path, max_distance_m=50)
+    assert memo.put("device-1", 45.5, -122.6, LOCATION)
+    assert memo.get("device-1", 45.5001, -122.6)["postal_code"] == "97201"
+    assert memo.get("device-1", 45.51, -122.6) is None
+    memo.close()
+
+    restarted = DeviceLocationMemo(store_path)
+    location = restarted.get("device-1", 45.5, -122.6)
+    assert location["postal_code"] == "97201"
+    assert location["postal_distance_m"] == 12.5
+    restarted.close()
+
+
+def test_store_without_postal_distance_column_is_migrated(tmp_path):
+    store_path = str(tmp_path / "memo.sqlite")
+    conn = sqlite3.connect(store_path)
+    conn.execute(
+        "CREATE TABLE device_locations (device_id TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL, "
+        "country TEXT, state TEXT, county TEXT, postal_code TEXT, city TEXT, usps_locale_name TEXT, "
+        "updated_at TEXT NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO device_locations VALUES ('device-1', 45.5, -122.6, 'US', 'OR', NULL, '97201', NULL, NULL, '')"
+    )
+    conn.commit()
+    conn.close()
+
+    memo = DeviceLocationMemo(store_path)
+    assert memo.get("device-1", 45.5, -122.6)["postal_distance_m"] is None
+    assert memo.put("device-2", 45.5, -122.6, LOCATION)
+    memo.close()
+
+    restarted = DeviceLocationMemo(store_path)
+    assert restarted.get("device-2", 45.5, -122.6)["postal_distance_m"] == 12.5
+    restarted.close()
+
+
+def test_put_from_before_clear_is_dropped(tmp_path):
+    memo = DeviceLocationMemo(str(tmp_path / "memo.sqlite"))
+    generation = memo.generation
+    memo.clear()
+
+    assert not memo.put("device-1", 45.5, -122.6, LOCATION, generation=generation)
+    assert memo.get("device-1", 45.5, -122.6) is None
+
+    assert memo.put("device-1", 45.5, -122.6, LOCATION, generation=memo.generation)
+    assert memo.get("device-1", 45.5, -122.6)["postal_code"] == "97201"
+    memo.close()
+
+
+def test_memo_from_other_reference_data_is_cleared_on_startup(tmp_path):
+    store_path = str(tmp_path / "memo.sqlite")
+    memo = DeviceLocationMemo(store_path)
+    assert not memo.use_reference({"wof": 3, "gadm": (1.0, 2.0, 3.0)})
+    assert memo.put("device-1", 45.5, -122.6, LOCATION)
+    memo.close()
+
+    restarted = DeviceLocationMemo(store_path)
+    assert not restarted.use_reference({"wof": 3, "gadm": (1.0, 2.0, 3.0)})
+    assert restarted.get("device-1", 45.5, -122.6)["postal_code"] == "97201"
+    restarted.close()
+
+    restarted = DeviceLocationMemo(store_path)
+    assert restarted.use_reference({"wof": 4, "gadm": (1.0, 2.0, 3.0)})
+    assert restarted.get("device-1", 45.5, -122.6) is None
+    restarted.close()
+
+    # The clear was persisted along with the new fingerprint
+    restarted = DeviceLocationMemo(store_path)
+    assert not restarted.use_reference({"wof": 4, "gadm": (1.0, 2.0, 3.0)})
+    assert restarted.get("device-1", 45.5, -122.6) is None
+    restarted.close()
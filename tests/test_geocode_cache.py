@@ -0,0 +1,51 @@
+from geoprocessor.geocode_cache import GeocodeCache
+
+RESULT = ("US", "Oregon", "Multnomah", "97201")
+
+
+def entry_bytes():
+    """Size one RESULT entry takes, measured on a scratch cache."""
+    scratch = GeocodeCache()
+    scratch.put(0.0, 0.0, RESULT)
+    return scratch.stats()["bytes"]
+
+
+def test_nearby_points_share_a_cell():
+    cache = GeocodeCache(cell_size_deg=0.01)
+    cache.put(45.501, -122.601, RESULT)
+
+    assert cache.get(45.509, -122.609) == RESULT
+    assert cache.get(45.511, -122.601) is None
+    assert cache.cell_bounds(45.501, -122.601) == cache.cell_bounds(45.509, -122.609)
+
+
+def test_max_bytes_evicts_least_recently_used_cell():
+    cache = GeocodeCache(cell_size_deg=0.01, max_bytes=2 * entry_bytes())
+    cache.put(0.005, 0.005, RESULT)
+    cache.put(0.015, 0.005, RESULT)
+    cache.get(0.005, 0.005)
+    cache.put(0.025, 0.005, RESULT)
+
+    assert cache.get(0.015, 0.005) is None
+    assert cache.get(0.005, 0.005) == RESULT
+    assert cache.get(0.025, 0.005) == RESULT
+    assert cache.stats()["evictions"] == 1
+
+
+def test_stats_count_hits_misses_and_bytes():
+    cache = GeocodeCache(cell_size_deg=0.01)
+    cache.put(0.005, 0.005, RESULT)
+    cache.put(0.005, 0.005, RESULT)  # Replacing a cell does not grow it
+    cache.get(0.005, 0.005)
+    cache.get(0.005, 0.005)
+    cache.get(1.0, 1.0)
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] == entry_bytes()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == 2 / 3
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,65 @@
+import json
+
+import polars as pl
+
+from reader.log_reader import LogReader
+
+
+def write_log(path, messages):
+    with open(path, "w") as f:
+        for i, message in enumerate(messages):
+            f.write(
+                f"[2025-01-01T00:00:{i:02d}] topic: weather/data | message: {json.dumps(message)} |\n"
+            )
+
+
+def reading(**values):
+    return {"device_id": "device-001", "lat": 45.5, "lon": -122.5, **values}
+
+
+def test_chunks_have_requested_size(tmp_path):
+    log = tmp_path / "weather.log"
+    write_log(log, [reading(temp=float(i)) for i in range(7)])
+
+    chunks = list(LogReader.iter_log_chunks(log, chunk_rows=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert pl.concat(chunks)["temp"].to_list() == [float(i) for i in range(7)]
+
+
+def test_later_floats_are_not_truncated(tmp_path):
+    log = tmp_path / "weather.log"
+    write_log(log, [reading(sats=4), reading(sats=5), reading(sats=2.7), reading(sats=6)])
+
+    chunks = list(LogReader.iter_log_chunks(log, chunk_rows=2))
+
+    assert chunks[1]["sats"].dtype == pl.Float64
+    assert chunks[1]["sats"].to_list() == [2.7, 6.0]
+
+
+def test_all_null_chunk_takes_dtype_from_later_chunk(tmp_path):
+    log = tmp_path / "weather.log"
+    write_log(log, [reading(), reading(), reading(temp=12.5), reading(temp=3)])
+
+    chunks = list(LogReader.iter_log_chunks(log, chunk_rows=2))
+
+    assert chunks[0]["temp"].to_list() == [None, None]
+    assert chunks[1]["temp"].dtype == pl.Float64
+    assert chunks[1]["temp"].to_list() == [12.5, 3.0]
+
+
+def test_chunks_match_read_log_file(tmp_path):
+    log = tmp_path / "weather.log"
+    write_log(log, [reading(temp=float(i), humidity=50.0) for i in range(5)])
+
+    streamed = pl.concat(LogReader.iter_log_chunks(log, chunk_rows=2))
+    whole = LogReader.read_log_file(log, return_as_dataframe=True)
+
+    assert streamed.select(whole.columns).equals(whole)
+
+
+def test_empty_log_yields_nothing(tmp_path):
+    log = tmp_path / "weather.log"
+    log.write_text("not a weather line\n")
+
+    assert list(LogReader.iter_log_chunks(log)) == []
@@ -0,0 +1,63 @@
+import polars as pl
+import shapely
+
+from geoprocessor.postal_adjacency import PostalAdjacency, load_postal_adjacency
+
+
+def box_frame(boxes):
+    """WOF-shaped frame of (postal_code, minx, miny, maxx, maxy) boxes."""
+    return pl.DataFrame(
+        {
+            "postal_code": [code for code, *_ in boxes],
+            "wkt_geometry": [shapely.box(*bounds).wkt for _, *bounds in boxes],
+        }
+    )
+
+
+ROW = [("A", 0.0, 0.0, 1.0, 1.0), ("B", 1.0, 0.0, 2.0, 1.0), ("C", 2.0, 0.0, 3.0, 1.0)]
+
+
+def test_stale_adjacency_is_ignored(tmp_path):
+    delta_path = str(tmp_path / "wof")
+    box_frame(ROW).write_delta(delta_path)
+    old_path, new_path = str(tmp_path / "old.parquet"), str(tmp_path / "new.parquet")
+    PostalAdjacency.build(box_frame(ROW), source_delta_version="0").save(old_path)
+    box_frame(ROW).write_delta(delta_path, mode="append")
+    PostalAdjacency.build(box_frame(ROW), source_delta_version="1").save(new_path)
+
+    # The table is at version 1 now, so the file built from version 0 is stale
+    assert load_postal_adjacency(old_path, delta_path) is None
+    loaded = load_postal_adjacency(new_path, delta_path)
+    assert loaded.source_delta_version == "1"
+    assert loaded.get("B") == PostalAdjacency.build(box_frame(ROW)).get("B")
+
+
+# A, B and C touch in a row; D lies east of C across a gap, E north of A
+SPREAD = [*ROW, ("D", 5.0, 0.0, 6.0, 1.0), ("E", 0.0, 3.0, 1.0, 4.0)]
+
+
+def test_touching_codes_are_always_listed():
+    adjacency = PostalAdjacency.build(box_frame(SPREAD), k=0)
+
+    assert adjacency.get("A") == ["B"]
+    assert sorted(adjacency.get("B")) == ["A", "C"]
+    assert adjacency.get("D") == []
+    assert adjacency.get("unknown") is None
+
+
+def test_nearest_codes_are_ordered_by_centroid_distance():
+    adjacency = PostalAdjacency.build(box_frame(SPREAD), k=2)
+
+    assert adjacency.get("A") == ["B", "C"]
+    assert adjacency.get("C") == ["B", "A"]
+    assert adjacency.get("D") == ["C", "B"]
+    assert adjacency.get("E") == ["A", "B"]
+
+
+def test_attach_keeps_rows_aligned_with_input():
+    adjacency = PostalAdjacency.build(box_frame(SPREAD), k=2)
+    df = pl.DataFrame({"postal_code": ["D", None, "Z", "A", "D"], "device_id": ["1", "2", "3", "4", "5"]})
+
+    attached = adjacency.attach(df)
+    assert attached["device_id"].to_list() == df["device_id"].to_list()
+    assert attached["nearby_postal_codes"].to_list() == [["C", "B"], None, None, ["B", "C"], ["C", "B"]]
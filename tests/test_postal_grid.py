@@ -0,0 +1,90 @@
+import numpy as np
+import polars as pl
+import shapely
+
+from geoprocessor.postal_grid import GRID_AMBIGUOUS, GRID_EMPTY, PostalGrid, load_postal_grid
+from geoprocessor.postal_index import PostalPolygonIndex
+
+
+def box_frame(boxes):
+    """WOF-shaped frame of (postal_code, minx, miny, maxx, maxy) boxes."""
+    return pl.DataFrame(
+        {
+            "postal_code": [code for code, *_ in boxes],
+            "wkt_geometry": [shapely.box(*bounds).wkt for _, *bounds in boxes],
+        }
+    )
+
+
+def write_wof_delta(path, mode="error"):
+    box_frame([("97201", 0.0, 0.0, 1.0, 1.0)]).write_delta(path, mode=mode)
+
+
+def test_grid_from_current_delta_version_is_loaded(tmp_path):
+    delta_path, grid_path = str(tmp_path / "wof"), str(tmp_path / "grid.npz")
+    write_wof_delta(delta_path)
+    PostalGrid.build(box_frame([("97201", 0.0, 0.0, 1.0, 1.0)]), 0.25, source_delta_version="0").save(grid_path)
+
+    grid = load_postal_grid(grid_path, delta_path)
+    assert grid is not None
+    assert grid.source_delta_version == "0"
+    assert np.array_equal(grid.cells, PostalGrid.load(grid_path).cells)
+
+
+def test_stale_or_unversioned_grid_is_ignored(tmp_path):
+    delta_path = str(tmp_path / "wof")
+    write_wof_delta(delta_path)
+    write_wof_delta(delta_path, mode="append")
+    frame = box_frame([("97201", 0.0, 0.0, 1.0, 1.0)])
+
+    stale_path, unversioned_path = str(tmp_path / "stale.npz"), str(tmp_path / "unversioned.npz")
+    PostalGrid.build(frame, 0.25, source_delta_version="0").save(stale_path)
+    PostalGrid.build(frame, 0.25).save(unversioned_path)
+
+    assert load_postal_grid(stale_path, delta_path) is None
+    assert load_postal_grid(unversioned_path, delta_path) is None
+    assert load_postal_grid(str(tmp_path / "missing.npz"), delta_path) is None
+
+
+# A and B share the x=1 border; C sits above a gap wider than a cell
+ADJACENT_BOXES = [("A", 0.0, 0.0, 1.0, 1.0), ("B", 1.0, 0.0, 2.0, 1.0), ("C", 0.0, 1.8, 2.0, 2.7)]
+
+
+def test_grid_cells_agree_with_the_polygon_index():
+    frame = box_frame(ADJACENT_BOXES)
+    grid = PostalGrid.build(frame, 0.3)
+    index = PostalPolygonIndex.from_frame(frame)
+    nrows, ncols = grid.cells.shape
+    rng = np.random.default_rng(0)
+
+    borders = shapely.union_all(shapely.boundary(shapely.from_wkt(frame["wkt_geometry"].to_numpy())))
+    for row in range(nrows):
+        for col in range(ncols):
+            minx, miny = grid.minx + col * 0.3, grid.miny + row * 0.3
+            cell = shapely.box(minx, miny, minx + 0.3, miny + 0.3)
+            value = grid.cells[row, col]
+            # Sample away from the cell's own edges, which belong to neighbours too
+            lats = miny + rng.uniform(0.01, 0.29, 20)
+            lons = minx + rng.uniform(0.01, 0.29, 20)
+            assert np.array_equal(grid.lookup_cells(lats, lons), np.full(20, value))
+
+            if cell.intersects(borders):
+                assert value == GRID_AMBIGUOUS
+            elif value == GRID_EMPTY:
+                assert all(index.locate(lat, lon) is None for lat, lon in zip(lats, lons))
+            else:
+                expected = {index.postal_codes[index.locate(lat, lon)] for lat, lon in zip(lats, lons)}
+                assert expected == {grid.postal_codes[value]}
+
+    # Every kind of cell occurs: interior to each box, empty, and straddling
+    assert set(grid.postal_codes_for(grid.cells.ravel())) == {"A", "B", "C", None}
+    assert (grid.cells == GRID_EMPTY).any()
+    assert grid.lookup_cells(np.array([0.5]), np.array([0.95]))[0] == GRID_AMBIGUOUS
+
+
+def test_points_off_the_grid_or_nan_fall_through():
+    grid = PostalGrid.build(box_frame(ADJACENT_BOXES), 0.3)
+
+    values = grid.lookup_cells(np.array([-0.1, 0.5, 5.0, np.nan, 0.5]), np.array([0.5, -0.1, 0.5, 0.5, np.nan]))
+    assert values.tolist() == [GRID_AMBIGUOUS] * 5
+    assert grid.postal_codes_for(values).tolist() == [None] * 5
@@ -0,0 +1,86 @@
+import numpy as np
+import shapely
+
+from geoprocessor.postal_index import PostalPolygonIndex
+
+
+def square(minx, miny, size=0.001):
+    return shapely.box(minx, miny, minx + size, miny + size)
+
+
+def build_index():
+    # At 45°N: A starts 0.009° east of the point (~708 m), B 0.0085° north (~945 m).
+    # B is nearer in raw degrees, A is nearer in metres.
+    geometries = np.array([square(-122.0 + 0.009, 45.0), square(-122.0, 45.0 + 0.0085)], dtype=object)
+    return PostalPolygonIndex(geometries, np.array(["A", "B"], dtype=object))
+
+
+def test_nearest_picks_nearest_in_metres_not_degrees():
+    index = build_index()
+
+    code, distance = index.nearest(45.0, -122.0, 1000)
+    assert code == "A"
+    assert 690 < distance < 730
+
+
+def test_nearest_finds_candidate_beyond_the_degree_nearest():
+    index = build_index()
+
+    code, distance = index.nearest(45.0, -122.0, 800)
+    assert code == "A"
+    assert distance <= 800
+
+
+def test_nearest_none_outside_max_distance():
+    index = build_index()
+
+    assert index.nearest(45.0, -122.0, 500) == (None, None)
+
+
+def test_nearest_many_aligned_to_input():
+    index = build_index()
+
+    codes, distances = index.nearest_many(
+        np.array([45.0, 10.0, 45.0085 + 0.0005]), np.array([-122.0, 10.0, -122.0 - 0.001]), 1000
+    )
+    assert codes.tolist() == ["A", None, "B"]
+    assert np.isnan(distances[1])
+
+
+def jagged_polygon(cx, cy, radius, n_vertices, seed):
+    """Star-shaped polygon whose radius jumps around by up to half, so edges zigzag."""
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radii = radius * rng.uniform(0.5, 1.0, n_vertices)
+    return shapely.Polygon(np.column_stack([cx + radii * np.cos(angles), cy + radii * np.sin(angles)]))
+
+
+def test_intersecting_pairs_match_exact_query_on_jagged_polygons():
+    # Two overlapping jagged polygons and a third touching neither
+    geometries = np.array(
+        [
+            jagged_polygon(0.0, 0.0, 0.01, 200, seed=1),
+            jagged_polygon(0.008, 0.0, 0.01, 200, seed=2),
+            jagged_polygon(0.05, 0.05, 0.005, 60, seed=3),
+        ],
+        dtype=object,
+    )
+    index = PostalPolygonIndex(geometries, np.array(["A", "B", "C"], dtype=object))
+    rng = np.random.default_rng(0)
+
+    # Uniform points, points jittered around the boundary within the edge band,
+    # and points exactly on vertices and on edge midpoints
+    coords = shapely.get_coordinates(shapely.boundary(geometries))
+    midpoints = (coords[:-1] + coords[1:]) / 2
+    uniform = rng.uniform([-0.012, -0.012], [0.06, 0.06], size=(2000, 2))
+    band = coords + rng.uniform(-0.0006, 0.0006, size=coords.shape)
+    points = shapely.points(np.vstack([uniform, band, coords, midpoints]))
+
+    point_idx, tree_idx = index.intersecting_pairs(points)
+    expected_point_idx, expected_tree_idx = index.tree.query(points, predicate="intersects")
+
+    assert sorted(zip(point_idx.tolist(), tree_idx.tolist())) == sorted(
+        zip(expected_point_idx.tolist(), expected_tree_idx.tolist())
+    )
+    # Every vertex is on its own polygon's edge and must be matched to it
+    assert len(set(tree_idx.tolist())) == 3
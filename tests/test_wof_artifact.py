@@ -0,0 +1,57 @@
+import polars as pl
+import pyarrow as pa
+
+from geoprocessor.wof_artifact import build_wof_artifact, open_wof_artifact, wof_artifact_is_current
+from geoprocessor.wof_shards import artifact_shard_loader
+
+
+def write_wof_delta(path, mode="error"):
+    pl.DataFrame(
+        {
+            "id": [1, 2],
+            "country": ["US", "US"],
+            "state": ["Oregon", "Washington"],
+            "postal_code": ["97201", "98101"],
+            "wkt_geometry": ["POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))", "POLYGON((0 1, 1 1, 1 2, 0 2, 0 1))"],
+        }
+    ).write_delta(path, mode=mode)
+
+
+def test_artifact_built_from_current_version_is_used(tmp_path):
+    delta_path, artifact_path = str(tmp_path / "wof"), str(tmp_path / "wof.arrow")
+    write_wof_delta(delta_path)
+    build_wof_artifact(delta_path, artifact_path)
+
+    assert wof_artifact_is_current(artifact_path, delta_path)
+
+
+def test_stale_artifact_is_refused(tmp_path):
+    delta_path, artifact_path = str(tmp_path / "wof"), str(tmp_path / "wof.arrow")
+    write_wof_delta(delta_path)
+    build_wof_artifact(delta_path, artifact_path)
+    write_wof_delta(delta_path, mode="append")
+
+    assert not wof_artifact_is_current(artifact_path, delta_path)
+
+
+def test_missing_artifact_is_refused(tmp_path):
+    delta_path = str(tmp_path / "wof")
+    write_wof_delta(delta_path)
+
+    assert not wof_artifact_is_current(str(tmp_path / "missing.arrow"), delta_path)
+    assert not wof_artifact_is_current(None, delta_path)
+
+
+def test_artifact_stays_an_arrow_table_and_shards_are_sliced_from_it(tmp_path):
+    delta_path, artifact_path = str(tmp_path / "wof"), str(tmp_path / "wof.arrow")
+    write_wof_delta(delta_path)
+    build_wof_artifact(delta_path, artifact_path)
+
+    table = open_wof_artifact(artifact_path)
+    assert isinstance(table, pa.Table)
+
+    shard = artifact_shard_loader(table)("US", "Washington")
+    assert isinstance(shard, pl.DataFrame)
+    assert shard["postal_code"].to_list() == ["98101"]
+    assert shard.select("minx", "miny", "maxx", "maxy").row(0) == (0.0, 1.0, 1.0, 2.0)
+    assert artifact_shard_loader(table)("US", "Idaho").is_empty()